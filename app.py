@@ -1,8 +1,35 @@
 # app.py
 
-from flask import Flask, request, jsonify
+from flask import Flask, g, has_request_context, request, jsonify
+import base64
+import contextlib
+import csv
+import functools
+import io
+import json
+import threading
+import time
+import uuid
+from urllib.parse import urlencode
+from werkzeug.datastructures import MultiDict
 import psycopg2
+from psycopg2 import errors
 from psycopg2.extras import RealDictCursor
+from psycopg2.pool import ThreadedConnectionPool
+
+from columnar import ColumnarStore
+from metrics import ROW_BUCKETS, Gauge, Histogram, Registry, RequestTimer
+from schema import aggregate_view, api_columns, column_types, total_expression, value_columns
+from response_cache import (
+    COMPRESSION, ResponseCache, cache_key, compress, compress_stream, make_etag, supported_encodings
+)
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # optional: only needed for format=arrow / format=parquet
+    pa = None
+    pq = None
 
 app = Flask(__name__)
 
@@ -15,98 +42,1147 @@ DB_CONFIG = {
     'port': 5432
 }
 
+# Connection pool shared by all request handlers
+POOL_CONFIG = {
+    'minconn': 1,               # connections opened up front
+    'maxconn': 10,              # upper bound on connections held by this process
+    'checkout_timeout': 10,     # seconds to wait for a free connection before failing
+    'health_check_after': 30,   # ping connections that have been idle this long
+}
+
+_pool = None
+_pool_lock = threading.Lock()
+_pool_slots = threading.BoundedSemaphore(POOL_CONFIG['maxconn'])
+_last_used = {}  # id(conn) -> time it was returned to the pool
+_broken = {'at': float('-inf')}  # last time a dead connection was found
+
+POOL_STATS = {
+    'checkouts': 0,        # connections handed out
+    'in_use': 0,           # connections currently checked out
+    'peak_in_use': 0,      # highest in_use seen
+    'waits': 0,            # checkouts that had to wait for a free connection
+    'timeouts': 0,         # checkouts that gave up waiting
+    'reconnects': 0,       # dead connections replaced (e.g. after a database restart)
+    'health_checks': 0,    # idle connections pinged before use
+}
+
+def _count(counter, amount=1):
+    with _pool_lock:
+        POOL_STATS[counter] += amount
+
+def get_pool():
+    """
+    Returns the process-wide connection pool, creating it on first use.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None or _pool.closed:
+            _pool = ThreadedConnectionPool(
+                POOL_CONFIG['minconn'],
+                POOL_CONFIG['maxconn'],
+                host=DB_CONFIG['host'],
+                dbname=DB_CONFIG['dbname'],
+                user=DB_CONFIG['user'],
+                password=DB_CONFIG['password'],
+                port=DB_CONFIG['port']
+            )
+        return _pool
+
+def _mark_broken():
+    """
+    Records that a dead connection was found. Its siblings probably died
+    with it (e.g. in a database restart), so every connection returned
+    before now is pinged before its next use.
+    """
+    _broken['at'] = time.monotonic()
+
+def _is_healthy(conn):
+    """
+    Pings a connection that has been idle for a while, or that was last
+    used before a dead connection was found. Other recently used
+    connections are trusted; if one has died anyway, with_connection()
+    retries the work on a fresh connection.
+    """
+    if conn.closed:
+        return False
+    last_used = _last_used.get(id(conn))
+    if last_used is None:
+        return True  # freshly opened
+    if time.monotonic() - last_used < POOL_CONFIG['health_check_after'] and last_used > _broken['at']:
+        return True  # recently used
+    _count('health_checks')
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT 1")
+        conn.rollback()
+        return True
+    except psycopg2.Error:
+        return False
+
 def get_db_connection():
-    conn = psycopg2.connect(
-        host=DB_CONFIG['host'],
-        dbname=DB_CONFIG['dbname'],
-        user=DB_CONFIG['user'],
-        password=DB_CONFIG['password'],
-        port=DB_CONFIG['port']
-    )
+    """
+    Checks a connection out of the pool, waiting up to `checkout_timeout`
+    seconds for one to free up. Dead connections are discarded until a
+    healthy one turns up (at worst a freshly opened one), so a database
+    restart does not hand out a broken connection.
+    Every connection must be handed back with release_db_connection().
+    """
+    with timed("connect"):
+        if not _pool_slots.acquire(blocking=False):
+            _count('waits')
+            if not _pool_slots.acquire(timeout=POOL_CONFIG['checkout_timeout']):
+                _count('timeouts')
+                raise psycopg2.OperationalError("Timed out waiting for a database connection from the pool")
+
+        try:
+            pool = get_pool()
+            for _ in range(POOL_CONFIG['maxconn'] + 1):
+                conn = pool.getconn()
+                if _is_healthy(conn):
+                    break
+                _count('reconnects')
+                _mark_broken()
+                _last_used.pop(id(conn), None)
+                pool.putconn(conn, close=True)
+            else:
+                raise psycopg2.OperationalError("Could not get a working database connection")
+        except Exception:
+            _pool_slots.release()
+            raise
+
+        with _pool_lock:
+            POOL_STATS['checkouts'] += 1
+            POOL_STATS['in_use'] += 1
+            POOL_STATS['peak_in_use'] = max(POOL_STATS['peak_in_use'], POOL_STATS['in_use'])
     return conn
 
-@app.route("/api/global_energy_substitution", methods=["GET"])
-def get_global_energy_substitution():
+def release_db_connection(conn):
     """
-    Returns all global energy substitution data or filtered by year if provided.
-    Example: /api/global_energy_substitution?year=2020
+    Returns a connection to the pool. Connections broken during the request
+    (e.g. by a database restart) are closed instead of being reused.
     """
-    year_filter = request.args.get("year", None)
-    conn = get_db_connection()
     try:
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            if year_filter:
-                cur.execute("""
-                    SELECT * FROM global_energy_substitution WHERE year = %s
-                    ORDER BY year ASC
-                """, (year_filter,))
-            else:
-                cur.execute("""
-                    SELECT * FROM global_energy_substitution ORDER BY year ASC
-                """)
-            records = cur.fetchall()
+        if conn.closed:
+            _mark_broken()
+            _last_used.pop(id(conn), None)
+            get_pool().putconn(conn, close=True)
+        else:
+            _last_used[id(conn)] = time.monotonic()
+            get_pool().putconn(conn)
     finally:
-        conn.close()
+        _count('in_use', -1)
+        _pool_slots.release()
+
+def connection_lost(conn, error):
+    """
+    True when `error` means `conn` itself died (e.g. the database
+    restarted since it was last used), rather than its query failing.
+    """
+    return isinstance(error, (psycopg2.OperationalError, psycopg2.InterfaceError)) and bool(conn.closed)
 
-    return jsonify(records), 200
+def with_connection(work, hand_over=False):
+    """
+    Calls work(conn) with a pooled connection and releases it afterwards.
+    If the connection turns out to be dead, the work is retried once on a
+    fresh one. With `hand_over`, `work` takes over the connection and
+    releases it itself, whether it succeeds or fails (see stream_records).
+    """
+    for attempt in (1, 2):
+        conn = get_db_connection()
+        try:
+            result = work(conn)
+        except Exception as error:
+            if not hand_over:
+                release_db_connection(conn)
+            if attempt == 2 or not connection_lost(conn, error):
+                raise
+            _count('reconnects')
+            continue
+        if not hand_over:
+            release_db_connection(conn)
+        return result
 
-@app.route("/api/share_renewables", methods=["GET"])
-def get_share_renewables():
+def pool_stats():
     """
-    Returns all share of electricity from renewables data or filtered by year if provided.
-    Example: /api/share_renewables?year=2020
+    Returns a snapshot of the pool usage counters.
+    """
+    with _pool_lock:
+        return dict(POOL_STATS, max_size=POOL_CONFIG['maxconn'], min_size=POOL_CONFIG['minconn'])
+
+# Response cache, invalidated whenever ingestion publishes a new data version
+CACHE_CONFIG = {
+    'max_entries': 256,                 # cached responses kept
+    'max_bytes': 64 * 1024 * 1024,      # total size of cached bodies
+    'version_check_interval': 5,        # seconds between data-version lookups
+}
+
+CACHED_HEADERS = ['X-Next-Cursor', 'Link']  # response headers stored with the body
+
+response_cache = ResponseCache(CACHE_CONFIG['max_entries'], CACHE_CONFIG['max_bytes'])
+_version_state = {'version': None, 'checked_at': 0.0}
+
+def current_data_version():
+    """
+    Returns the data version stamped by ingestion.py. The database is asked
+    at most once per `version_check_interval`; in between, cached responses
+    and 304s are served without touching it.
+    """
+    now = time.monotonic()
+    if (_version_state['version'] is not None
+            and now - _version_state['checked_at'] < CACHE_CONFIG['version_check_interval']):
+        return _version_state['version']
+
+    def read_version(conn):
+        try:
+            with conn.cursor() as cur:
+                return run_query(cur, "SELECT version FROM data_version WHERE id = 1")
+        except errors.UndefinedTable:
+            return []  # ingestion has not run yet
+
+    rows = with_connection(read_version)
+
+    _version_state['version'] = rows[0][0] if rows else 0
+    _version_state['checked_at'] = now
+    response_cache.set_version(_version_state['version'])
+    return _version_state['version']
+
+# -------------------------------------------------------------------------
+# Request instrumentation, served in Prometheus format on /metrics
+# -------------------------------------------------------------------------
+METRICS_CONFIG = {
+    'slow_request_seconds': None,   # log requests slower than this, with their SQL (None: off)
+}
+
+metrics_registry = Registry()
+REQUEST_SECONDS = metrics_registry.register(Histogram(
+    "api_request_duration_seconds", "Time to serve a request, including streaming its body.",
+    ["route", "method", "status"],
+))
+PHASE_SECONDS = metrics_registry.register(Histogram(
+    "api_request_phase_seconds",
+    "Time a request spent in each phase: connect, query, fetch, serialize, compress.",
+    ["route", "phase"],
+))
+QUERY_SECONDS = metrics_registry.register(Histogram(
+    "api_query_duration_seconds", "Time to execute one SQL query and fetch its rows.", ["route"],
+))
+QUERY_ROWS = metrics_registry.register(Histogram(
+    "api_query_rows", "Rows returned by one SQL query.", ["route"], ROW_BUCKETS,
+))
+metrics_registry.register(Gauge(
+    "api_pool_connections", "Database pool connections by state.",
+    lambda: [({"state": "in_use"}, pool_stats()['in_use']), ({"state": "max"}, POOL_CONFIG['maxconn'])],
+))
+metrics_registry.register(Gauge(
+    "api_response_cache", "Response cache counters.",
+    lambda: [({"stat": name}, value) for name, value in response_cache.info().items() if name != 'version'],
+))
+
+def current_timer():
     """
-    year_filter = request.args.get("year", None)
-    conn = get_db_connection()
+    Returns the RequestTimer of the current request, or None outside one.
+    """
+    return g.get('timer') if has_request_context() else None
+
+def timed(phase):
+    """
+    Context manager adding the time spent in its block to `phase` of the
+    current request. Does nothing outside a request.
+    """
+    timer = current_timer()
+    return timer.phase(phase) if timer is not None else contextlib.nullcontext()
+
+def run_query(cur, query, params=None):
+    """
+    Executes `query` and fetches all its rows, timing the query and fetch
+    phases and recording the SQL and row count for the current request.
+    """
+    started = time.perf_counter()
+    with timed("query"):
+        cur.execute(query, params)
+    with timed("fetch"):
+        rows = cur.fetchall()
+    timer = current_timer()
+    if timer is not None:
+        timer.add_query(query, params, len(rows), time.perf_counter() - started)
+    return rows
+
+@app.before_request
+def start_request_timer():
+    route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+    g.timer = RequestTimer(route, request.method, request.full_path.rstrip("?"))
+
+@app.after_request
+def finish_request_timer(response):
+    """
+    Records the request's metrics once its body has been sent, so streamed
+    responses are timed to their last byte.
+    """
+    timer = g.get('timer')
+    if timer is not None:
+        response.call_on_close(functools.partial(record_request, timer, response.status_code))
+    return response
+
+def record_request(timer, status):
+    elapsed = timer.elapsed()
+    REQUEST_SECONDS.observe(elapsed, route=timer.route, method=timer.method, status=str(status))
+    for phase, seconds in timer.phases.items():
+        PHASE_SECONDS.observe(seconds, route=timer.route, phase=phase)
+    for _, _, rows, seconds in timer.queries:
+        QUERY_SECONDS.observe(seconds, route=timer.route)
+        QUERY_ROWS.observe(rows, route=timer.route)
+
+    threshold = METRICS_CONFIG['slow_request_seconds']
+    if threshold is not None and elapsed >= threshold:
+        phases = ", ".join(f"{phase} {seconds:.3f}s" for phase, seconds in timer.phases.items())
+        print(f"Slow request: {timer.method} {timer.path} -> {status} in {elapsed:.3f}s ({phases})")
+        for sql, params, rows, seconds in timer.queries:
+            print(f"    {seconds:.3f}s, {rows} rows: {' '.join(sql.split())} -- params: {repr(params)[:500]}")
+
+# Optional in-memory serving of the data endpoints (see columnar.py).
+# When enabled, the tables are loaded into NumPy columns on the first
+# request and reloaded whenever ingestion publishes a new data version;
+# filtered and paginated reads are then answered without the database.
+COLUMNAR_CONFIG = {
+    'enabled': False,
+    'load_retry_seconds': 30,   # requests use the database this long after a failed first load
+}
+
+columnar_store = ColumnarStore(get_db_connection, release_db_connection, COLUMNAR_CONFIG['load_retry_seconds'])
+
+def columnar_snapshot():
+    """
+    Returns the in-memory snapshot of the current data version, or None
+    when columnar serving is off or the snapshot is still (re)loading.
+    """
+    if not COLUMNAR_CONFIG['enabled']:
+        return None
+    return columnar_store.get(current_data_version())
+
+def _cache_stream(chunks, key, mimetype, version, headers):
+    """
+    Passes a streamed body through unchanged, keeping a copy to cache once
+    it completes. The copy is abandoned as soon as it outgrows the cache.
+    """
+    parts, size = [], 0
     try:
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            if year_filter:
-                cur.execute("""
-                    SELECT * FROM share_electricity_renewables WHERE year = %s
-                    ORDER BY year ASC
-                """, (year_filter,))
+        for chunk in chunks:
+            if parts is not None:
+                data = chunk.encode("utf-8") if isinstance(chunk, str) else chunk
+                size += len(data)
+                if size > response_cache.max_bytes:
+                    parts = None
+                else:
+                    parts.append(data)
+            yield chunk
+        if parts is not None:
+            response_cache.put(key, b"".join(parts), mimetype, version, headers)
+    finally:
+        if hasattr(chunks, "close"):
+            chunks.close()
+
+def cached_response(view):
+    """
+    Serves a GET endpoint from the response cache. Responses carry an ETag
+    derived from the data version, so clients revalidating with
+    If-None-Match get a 304 without the query running.
+
+    The cache holds the uncompressed body; compressed copies are added to
+    the entry by compress_response() the first time each encoding is asked for.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        version = current_data_version()
+        # The format can come from the Accept header, so it is part of the key
+        key = cache_key(request.path, request.args, LIST_FILTERS) + (negotiate_format(),)
+        # Each encoding of the body is a different representation with its own ETag
+        etag = make_etag(version, key + (negotiate_encoding(),))
+
+        if etag in request.if_none_match:
+            response = app.response_class(status=304)
+        else:
+            entry = response_cache.get(key)
+            if entry is not None:
+                response = app.response_class(
+                    entry['body'], mimetype=entry['mimetype'], headers=entry['headers']
+                )
+                g.cache_entry = (key, version)
             else:
-                cur.execute("""
-                    SELECT * FROM share_electricity_renewables ORDER BY year ASC
-                """)
-            records = cur.fetchall()
+                response = app.make_response(view(*args, **kwargs))
+                if response.status_code == 200:
+                    headers = {h: response.headers[h] for h in CACHED_HEADERS if h in response.headers}
+                    if response.is_streamed:
+                        response.response = _cache_stream(
+                            response.response, key, response.mimetype, version, headers
+                        )
+                    else:
+                        response_cache.put(key, response.get_data(), response.mimetype, version, headers)
+                        g.cache_entry = (key, version)
+
+        response.set_etag(etag)
+        response.vary.add('Accept')
+        response.headers['Cache-Control'] = 'no-cache'  # always revalidate
+        return response
+    return wrapper
+
+# -------------------------------------------------------------------------
+# Response compression
+# -------------------------------------------------------------------------
+# Formats that are already compressed and gain nothing from gzip/brotli
+PRECOMPRESSED_MIMETYPES = {"application/vnd.apache.parquet"}
+
+def negotiate_encoding():
+    """
+    Picks "br" or "gzip" from the Accept-Encoding header, or None to send
+    the body uncompressed. Brotli is only offered when it is installed.
+    """
+    return request.accept_encodings.best_match(supported_encodings())
+
+@app.after_request
+def compress_response(response):
+    """
+    Compresses successful responses for clients that accept it. Cached
+    bodies are compressed once and the result kept in the cache entry;
+    streamed bodies are compressed incrementally as they are sent.
+    """
+    response.vary.add('Accept-Encoding')
+    if (response.status_code != 200 or response.direct_passthrough
+            or 'Content-Encoding' in response.headers
+            or response.mimetype in PRECOMPRESSED_MIMETYPES):
+        return response
+    encoding = negotiate_encoding()
+    if encoding is None:
+        return response
+
+    if response.is_streamed:
+        response.response = compress_stream(response.response, encoding)
+    else:
+        body = response.get_data()
+        if len(body) < COMPRESSION['min_size']:
+            return response
+        compressed = None
+        if 'cache_entry' in g:
+            compressed = response_cache.encoded(*g.cache_entry, encoding)
+        with timed("compress"):
+            response.set_data(compressed if compressed is not None else compress(body, encoding))
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+# -------------------------------------------------------------------------
+# Query building shared by the data endpoints
+# -------------------------------------------------------------------------
+MAX_PAGE_SIZE = 10000
+STREAM_BATCH_SIZE = 2000             # rows fetched per round trip when streaming
+KEYSET_COLUMNS = ["year", "entity"]  # sort order and pagination key
+MAX_FILTER_VALUES = 500              # values accepted by one list filter
+MAX_BATCH_QUERIES = 20               # sub-queries accepted by /api/batch
+
+# Filters accepted by every data endpoint:
+# name -> (SQL condition, value type, whether several values are allowed).
+# List filters match with `= ANY(array)`, which uses the table indexes
+# (entity, year), (year, entity) and (code, year) like a plain `=` does.
+FILTERS = {
+    "year": ("year = ANY(%s)", int, True),
+    "year_from": ("year >= %s", int, False),
+    "year_to": ("year <= %s", int, False),
+    "entity": ("entity = ANY(%s)", str, True),
+    "code": ("code = ANY(%s)", str, True),
+}
+LIST_FILTERS = {name for name, (_, _, multiple) in FILTERS.items() if multiple}
+
+# URL name of each data endpoint -> the table it serves
+ENDPOINT_TABLES = {
+    "global_energy_substitution": "global_energy_substitution",
+    "share_renewables": "share_electricity_renewables",
+    "per_capita_energy": "per_capita_energy",
+}
+
+class ApiError(Exception):
+    """
+    A client error, returned as a JSON body with a 400 status
+    (or the status given).
+    """
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+@app.errorhandler(ApiError)
+def handle_api_error(error):
+    return jsonify({"error": str(error)}), error.status
+
+def parse_fields(table, value):
+    """
+    Turns `fields=a,b,c` into a validated column list for `table`.
+    Without it, every API column is returned.
+    """
+    allowed = api_columns(table)
+    if not value:
+        return allowed
+    fields = [f.strip() for f in value.split(",") if f.strip()]
+    unknown = [f for f in fields if f not in allowed]
+    if unknown:
+        raise ApiError(f"Unknown field(s) {', '.join(unknown)}; available: {', '.join(allowed)}")
+    return list(dict.fromkeys(fields))
+
+def parse_int(name, value, minimum=None, maximum=None):
+    """
+    Parses an integer query parameter, or returns None when it is absent.
+    """
+    if value is None or value.strip() == "":
+        return None
+    try:
+        number = int(value)
+    except ValueError:
+        raise ApiError(f"'{name}' must be an integer")
+    if (minimum is not None and number < minimum) or (maximum is not None and number > maximum):
+        raise ApiError(f"'{name}' must be between {minimum} and {maximum}")
+    return number
+
+def split_list_value(raw):
+    """
+    Splits a filter value on commas. A backslash escapes the next
+    character, so `\\,` is a comma inside a value (`Korea\\, Rep.`).
+    """
+    values, current, chars = [], [], iter(raw)
+    for char in chars:
+        if char == "\\":
+            current.append(next(chars, "\\"))
+        elif char == ",":
+            values.append("".join(current))
+            current = []
+        else:
+            current.append(char)
+    values.append("".join(current))
+    return values
+
+def escape_list_value(value):
+    """
+    Escapes one filter value so split_list_value() returns it whole.
+    """
+    return str(value).replace("\\", "\\\\").replace(",", "\\,")
+
+def parse_filters(args):
+    """
+    Reads the FILTERS from the query parameters `args` (a MultiDict).
+    List filters can be repeated (`entity=A&entity=B`) or comma-separated
+    (`entity=A,B`, see split_list_value for commas inside a value).
+    Returns a dict of filter name -> value or list of values.
+    """
+    filters = {}
+    for name, (_, value_type, multiple) in FILTERS.items():
+        values = [v.strip() for raw in args.getlist(name) for v in split_list_value(raw) if v.strip()]
+        if not values:
+            continue
+        if value_type is int:
+            values = [parse_int(name, v) for v in values]
+        if not multiple:
+            if len(values) > 1:
+                raise ApiError(f"'{name}' takes a single value")
+            filters[name] = values[0]
+        elif len(values) > MAX_FILTER_VALUES:
+            raise ApiError(f"'{name}' takes at most {MAX_FILTER_VALUES} values")
+        else:
+            filters[name] = list(dict.fromkeys(values))
+
+    if filters.get("year_from", float("-inf")) > filters.get("year_to", float("inf")):
+        raise ApiError("'year_from' must not be after 'year_to'")
+    return filters
+
+def parse_query(table, args):
+    """
+    Validates the query parameters `args` for `table` and returns
+    (fields, filters, limit, after) for build_select().
+    """
+    fields = parse_fields(table, args.get("fields"))
+    limit = parse_int("limit", args.get("limit"), 1, MAX_PAGE_SIZE)
+    after = decode_cursor(args.get("cursor"))
+    if after is not None and limit is None:
+        raise ApiError("'cursor' requires 'limit'")
+    return fields, parse_filters(args), limit, after
+
+def encode_cursor(row):
+    """
+    Encodes the keyset position of `row` as an opaque cursor.
+    """
+    position = json.dumps([row[c] for c in KEYSET_COLUMNS])
+    return base64.urlsafe_b64encode(position.encode("utf-8")).decode("ascii")
+
+def decode_cursor(value):
+    """
+    Decodes a cursor produced by encode_cursor, or returns None when absent.
+    """
+    if not value:
+        return None
+    try:
+        position = json.loads(base64.urlsafe_b64decode(value.encode("ascii")))
+    except ValueError:
+        raise ApiError("Invalid cursor")
+    if not isinstance(position, list) or len(position) != len(KEYSET_COLUMNS):
+        raise ApiError("Invalid cursor")
+    year, entity = position
+    # A tampered cursor must not reach the query with values of the wrong type
+    if not isinstance(year, int) or isinstance(year, bool) or not (entity is None or isinstance(entity, str)):
+        raise ApiError("Invalid cursor")
+    return position
+
+def filter_conditions(filters, names=None):
+    """
+    Returns the SQL conditions and parameters of the parsed `filters`,
+    optionally only those listed in `names`.
+    """
+    conditions, params = [], []
+    for name, value in filters.items():
+        if names is None or name in names:
+            conditions.append(FILTERS[name][0])
+            params.append(value)
+    return conditions, params
+
+def selected_columns(fields, limit=None):
+    """
+    Returns the columns build_select() reads: the requested fields, plus the
+    keyset columns when paginating (the cursor needs them).
+    """
+    if limit is None:
+        return list(fields)
+    return list(fields) + [c for c in KEYSET_COLUMNS if c not in fields]
+
+def build_select(table, fields, filters, limit=None, after=None):
+    """
+    Builds a parameterized SELECT of `fields` from `table`. `filters` is
+    the output of parse_filters(). With `limit`, one extra row is read
+    so the caller can tell whether another page follows; `after` is the
+    keyset position to continue from.
+    """
+    columns = selected_columns(fields, limit)
+
+    conditions, params = filter_conditions(filters)
+    if after is not None:
+        conditions.append(f"({', '.join(KEYSET_COLUMNS)}) > ({', '.join(['%s'] * len(after))})")
+        params.extend(after)
+
+    query = f"SELECT {', '.join(columns)} FROM {table}"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += " ORDER BY " + ", ".join(f"{c} ASC" for c in KEYSET_COLUMNS)
+    if limit is not None:
+        query += " LIMIT %s"
+        params.append(limit + 1)
+    return query, tuple(params)
+
+# -------------------------------------------------------------------------
+# Output formats
+# -------------------------------------------------------------------------
+OUTPUT_FORMATS = {
+    "json": "application/json",
+    "csv": "text/csv",
+    "arrow": "application/vnd.apache.arrow.stream",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+def negotiate_format(args=None, accept_mimetypes=None):
+    """
+    Picks the output format from `format=`, or else from the Accept header.
+    JSON is the default. Uses the current Flask request unless the query
+    parameters and a parsed Accept header are given (as asgi_app.py does).
+    """
+    if args is None:
+        args, accept_mimetypes = request.args, request.accept_mimetypes
+    value = args.get("format", "").strip().lower()
+    if value:
+        if value not in OUTPUT_FORMATS:
+            raise ApiError(f"Unknown format '{value}'; available: {', '.join(OUTPUT_FORMATS)}")
+        return value
+    best = accept_mimetypes.best_match(list(OUTPUT_FORMATS.values()), default="application/json")
+    return next(name for name, mimetype in OUTPUT_FORMATS.items() if mimetype == best)
+
+def arrow_type(sql_type):
+    """
+    Maps a schema.py SQL type to its Arrow type.
+    """
+    return {"TEXT": pa.string(), "INT": pa.int32(), "FLOAT": pa.float64()}[sql_type]
+
+def encode_rows(fmt, table, columns, rows):
+    """
+    Encodes query result tuples as CSV, Arrow IPC (stream) or Parquet.
+    Arrow columns are built straight from the tuples with the column types
+    from schema.py, so pandas can load them without any type coercion.
+    """
+    if fmt == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator="\n")
+        writer.writerow(columns)
+        writer.writerows(rows)
+        return buffer.getvalue()
+
+    types = dict(column_types(table), id="INT", **AGGREGATE_COLUMN_TYPES)
+    values = list(zip(*rows)) if rows else [()] * len(columns)
+    arrow_table = pa.table(
+        [pa.array(column, type=arrow_type(types[name])) for name, column in zip(columns, values)],
+        names=columns,
+    )
+    sink = pa.BufferOutputStream()
+    if fmt == "arrow":
+        with pa.ipc.new_stream(sink, arrow_table.schema) as writer:
+            writer.write_table(arrow_table)
+    else:
+        pq.write_table(arrow_table, sink)
+    return sink.getvalue().to_pybytes()
+
+def stream_records(conn, query, params, columns):
+    """
+    Yields a JSON array of the query's rows, read from a server-side (named)
+    cursor STREAM_BATCH_SIZE rows at a time, so memory use and time to first
+    byte don't grow with the table. The output matches jsonify() byte for
+    byte, compact or pretty-printed as in debug mode (see compact_json).
+    The connection goes back to the pool when the stream ends or the
+    client disconnects.
+    """
+    # The body is sent after the request context is gone, so keep its timer
+    timer = current_timer() or RequestTimer("stream", "GET")
+    started, count = time.perf_counter(), 0
+    # Pretty-printed arrays put each item on its own lines inside "[\n" and "\n]"
+    if compact_json():
+        dump_args, edge, separator = {"separators": (",", ":")}, "", ","
+    else:
+        dump_args, edge, separator = {"indent": 2}, "\n", ",\n"
+    try:
+        with conn.cursor(name=f"stream_{uuid.uuid4().hex}") as cur:
+            cur.itersize = STREAM_BATCH_SIZE
+            with timer.phase("query"):
+                cur.execute(query, params)
+            yield "["
+            prefix = edge
+            while True:
+                with timer.phase("fetch"):
+                    rows = cur.fetchmany(STREAM_BATCH_SIZE)
+                if not rows:
+                    break
+                count += len(rows)
+                # Serialize the whole batch at once; its own brackets are dropped below
+                with timer.phase("serialize"):
+                    batch = app.json.dumps([dict(zip(columns, row)) for row in rows], **dump_args)
+                yield prefix + batch[1 + len(edge):-1 - len(edge)]
+                prefix = separator
+            yield (edge if count else "") + "]\n"
     finally:
-        conn.close()
+        timer.add_query(query, params, count, time.perf_counter() - started)
+        release_db_connection(conn)
+
+def compact_json():
+    """
+    True when jsonify() writes compact JSON: app.json.compact, or when that
+    is None, outside debug mode (Flask pretty-prints in debug).
+    """
+    compact = app.json.compact
+    return not app.debug if compact is None else compact
+
+def _prepend(first, chunks):
+    """
+    Yields `first` and then the rest of a started generator.
+    """
+    try:
+        yield first
+        yield from chunks
+    finally:
+        chunks.close()
+
+def _finish_page(records, columns, fields, limit, as_dicts):
+    """
+    Trims the extra row read by build_select() into a next-page cursor and
+    drops the keyset columns that were only read for that cursor.
+    """
+    next_cursor = None
+    if limit is not None and len(records) > limit:
+        records = records[:limit]
+        last = records[-1] if as_dicts else dict(zip(columns, records[-1]))
+        next_cursor = encode_cursor(last)
+
+    extra = columns[len(fields):]
+    if extra:
+        if as_dicts:
+            for record in records:
+                for column in extra:
+                    del record[column]
+        else:
+            records = [row[:len(fields)] for row in records]
+    return records, next_cursor
+
+def fetch_page(conn, table, fields, filters, limit, after, as_dicts=True):
+    """
+    Runs build_select() and returns (records, next_cursor). Records are
+    dicts, or plain tuples with `as_dicts=False` (the columnar formats are
+    built from those, never from per-row dicts). next_cursor is None on the
+    last page.
+    """
+    query, params = build_select(table, fields, filters, limit, after)
+    with conn.cursor(cursor_factory=RealDictCursor if as_dicts else None) as cur:
+        records = run_query(cur, query, params)
+    return _finish_page(records, selected_columns(fields, limit), fields, limit, as_dicts)
+
+def memory_page(table, fields, filters, limit, after, as_dicts=True):
+    """
+    Same as fetch_page(), answered from the columnar snapshot. Returns None
+    when there is no snapshot to use, so the caller goes to the database.
+    """
+    snapshot = columnar_snapshot()
+    if snapshot is None:
+        return None
+    columns = selected_columns(fields, limit)
+    rows = snapshot.tables[table].select(columns, filters, None if limit is None else limit + 1, after)
+    if rows is None:
+        return None
+    records = [dict(zip(columns, row)) for row in rows] if as_dicts else rows
+    return _finish_page(records, columns, fields, limit, as_dicts)
+
+def table_response(table):
+    """
+    Runs a data endpoint's query from the request parameters and returns the
+    rows as JSON, CSV, Arrow or Parquet (see negotiate_format). Supports
+    `fields=` projection, the FILTERS, and keyset pagination via `limit=`
+    and `cursor=`; the cursor of the next page is sent in the
+    `X-Next-Cursor` header (and a `Link: rel="next"` header).
+    Unfiltered, unpaginated requests (full tables) are streamed.
+    """
+    fields, filters, limit, after = parse_query(table, request.args)
+
+    fmt = negotiate_format()
+    if fmt in ("arrow", "parquet") and pa is None:
+        raise ApiError(f"format={fmt} requires pyarrow, which is not installed on the server", status=406)
+
+    page = memory_page(table, fields, filters, limit, after, as_dicts=fmt == "json")
+    if page is None:
+        if fmt == "json" and not filters and limit is None:
+            query, params = build_select(table, fields, filters)
+
+            def start_stream(conn):
+                # Start the stream here so query errors still become a normal 500.
+                # The generator releases its connection however it ends.
+                chunks = stream_records(conn, query, params, fields)
+                return next(chunks), chunks
+
+            first, chunks = with_connection(start_stream, hand_over=True)
+            return app.response_class(_prepend(first, chunks), mimetype="application/json")
+
+        page = with_connection(
+            lambda conn: fetch_page(conn, table, fields, filters, limit, after, as_dicts=fmt == "json")
+        )
+    records, next_cursor = page
+
+    with timed("serialize"):
+        if fmt == "json":
+            response = jsonify(records)
+        else:
+            response = app.response_class(encode_rows(fmt, table, fields, records), mimetype=OUTPUT_FORMATS[fmt])
 
-    return jsonify(records), 200
+    if next_cursor:
+        args = request.args.to_dict(flat=False)
+        args["cursor"] = [next_cursor]
+        response.headers["X-Next-Cursor"] = next_cursor
+        response.headers["Link"] = f'<{request.path}?{urlencode(args, doseq=True)}>; rel="next"'
+    return response, 200
+
+# -------------------------------------------------------------------------
+# Aggregations, computed in SQL so clients only receive the final rows
+# -------------------------------------------------------------------------
+MAX_TOP_N = 1000
+MAX_ROLLING_WINDOW = 50
+ENTITY_FILTERS = ("entity", "code")     # filters that select whole series
+AGGREGATE_COLUMN_TYPES = {"total": "FLOAT", "rank": "INT", "rolling_avg": "FLOAT"}
+YEARLY_STATS = ("sum", "avg")
+
+def parse_metric(table, value):
+    """
+    Validates `metric=`: a measurement column of `table`, or "total" (the
+    sum across all of them, missing values counted as zero).
+    Returns (name, SQL expression).
+    """
+    metric = (value or "total").strip()
+    if metric == "total":
+        return metric, f"({total_expression(table)})"
+    if metric not in value_columns(table):
+        raise ApiError(f"Unknown metric '{metric}'; available: total, {', '.join(value_columns(table))}")
+    return metric, metric
+
+def _where(conditions):
+    return " WHERE " + " AND ".join(conditions) if conditions else ""
+
+def totals_query(table, args):
+    """
+    Per-entity totals across sources: one row per entity and year.
+    """
+    filters = parse_filters(args)
+    conditions, params = filter_conditions(filters)
+    view = aggregate_view(table, "ranked")
+    if view:
+        source, total = view, "total_per_capita"
+    else:
+        source, total = table, total_expression(table)
+        conditions.insert(0, "entity IS NOT NULL")  # as in the ranked views
+    query = (f"SELECT entity, code, year, {total} AS total FROM {source}"
+             f"{_where(conditions)} ORDER BY year ASC, entity ASC")
+    return query, tuple(params), ["entity", "code", "year", "total"]
+
+def top_query(table, args):
+    """
+    The top `n` entities of each selected year by `metric`, with every
+    measurement column, the total and the rank. Ties share a rank, so a year
+    can return more than `n` rows when entities tie at the cut-off.
+    """
+    filters = parse_filters(args)
+    n = parse_int("n", args.get("n"), 1, MAX_TOP_N) or 10
+    metric, expression = parse_metric(table, args.get("metric"))
+    values = value_columns(table)
+    columns = ["entity", "code", "year"] + values + ["total", "rank"]
+
+    view = aggregate_view(table, "ranked")
+    if view and metric == "total" and not any(f in filters for f in ENTITY_FILTERS):
+        # Ranks are precomputed per year; the (year, rank) index finds the rows
+        conditions, params = filter_conditions(filters)
+        conditions.append("rank <= %s")
+        query = (f"SELECT entity, code, year, {', '.join(values)}, total_per_capita AS total, rank"
+                 f" FROM {view}{_where(conditions)} ORDER BY year ASC, rank ASC, entity ASC")
+        return query, tuple(params + [n]), columns
+
+    # Ranks among the filtered entities only
+    conditions, params = filter_conditions(filters)
+    conditions.insert(0, "entity IS NOT NULL")
+    query = f"""
+        SELECT {', '.join(columns)} FROM (
+            SELECT entity, code, year, {', '.join(values)},
+                {total_expression(table)} AS total,
+                RANK() OVER (PARTITION BY year ORDER BY {expression} DESC NULLS LAST) AS rank
+            FROM {table}{_where(conditions)}
+        ) ranked
+        WHERE rank <= %s
+        ORDER BY year ASC, rank ASC, entity ASC
+    """
+    return query, tuple(params + [n]), columns
+
+def yearly_query(table, args):
+    """
+    Per-year global sums (or averages, with `stat=avg`) of every
+    measurement column and of the total, over the selected entities.
+    """
+    filters = parse_filters(args)
+    stat = (args.get("stat") or "sum").strip().lower()
+    if stat not in YEARLY_STATS:
+        raise ApiError(f"Unknown stat '{stat}'; available: {', '.join(YEARLY_STATS)}")
+    values = value_columns(table)
+    columns = ["year"] + values + ["total"]
+
+    view = aggregate_view(table, "yearly")
+    if view and stat == "sum" and not any(f in filters for f in ENTITY_FILTERS):
+        conditions, params = filter_conditions(filters)
+        query = f"SELECT {', '.join(columns)} FROM {view}{_where(conditions)} ORDER BY year ASC"
+        return query, tuple(params), columns
+
+    conditions, params = filter_conditions(filters)
+    aggregates = [f"{stat.upper()}({c}) AS {c}" for c in values]
+    aggregates.append(f"{stat.upper()}({total_expression(table)}) AS total")
+    query = (f"SELECT year, {', '.join(aggregates)} FROM {table}{_where(conditions)}"
+             f" GROUP BY year ORDER BY year ASC")
+    return query, tuple(params), columns
+
+def rolling_query(table, args):
+    """
+    Trailing `window`-year rolling average of `metric` for each entity.
+    The window spans years, not rows, so a missing year shortens it
+    instead of reaching further back. Year filters only trim the output,
+    so the first selected years still average over the years before them.
+    """
+    filters = parse_filters(args)
+    metric, expression = parse_metric(table, args.get("metric"))
+    window = parse_int("window", args.get("window"), 1, MAX_ROLLING_WINDOW) or 5
+
+    inner_conditions, inner_params = filter_conditions(filters, ENTITY_FILTERS)
+    inner_conditions.insert(0, "entity IS NOT NULL")
+    outer_conditions, outer_params = filter_conditions(
+        filters, [name for name in FILTERS if name not in ENTITY_FILTERS]
+    )
+    query = f"""
+        SELECT entity, code, year, {metric}, rolling_avg FROM (
+            SELECT entity, code, year, {expression} AS {metric},
+                AVG({expression}) OVER (
+                    PARTITION BY entity ORDER BY year
+                    RANGE BETWEEN %s PRECEDING AND CURRENT ROW
+                ) AS rolling_avg
+            FROM {table}{_where(inner_conditions)}
+        ) windowed{_where(outer_conditions)}
+        ORDER BY year ASC, entity ASC
+    """
+    params = [window - 1] + inner_params + outer_params
+    return query, tuple(params), ["entity", "code", "year", metric, "rolling_avg"]
+
+# Aggregation name (last URL segment) -> query builder
+AGGREGATIONS = {
+    "totals": totals_query,
+    "top": top_query,
+    "yearly": yearly_query,
+    "rolling": rolling_query,
+}
+
+def aggregate_response(endpoint, aggregation):
+    """
+    Runs an aggregation over a data endpoint's table and returns the rows
+    as JSON, CSV, Arrow or Parquet (see negotiate_format).
+    """
+    if endpoint not in ENDPOINT_TABLES or aggregation not in AGGREGATIONS:
+        raise ApiError(f"Unknown aggregation /api/{endpoint}/{aggregation}", status=404)
+    table = ENDPOINT_TABLES[endpoint]
+    query, params, columns = AGGREGATIONS[aggregation](table, request.args)
+
+    fmt = negotiate_format()
+    if fmt in ("arrow", "parquet") and pa is None:
+        raise ApiError(f"format={fmt} requires pyarrow, which is not installed on the server", status=406)
+
+    def run(conn):
+        with conn.cursor() as cur:
+            return run_query(cur, query, params)
+
+    rows = with_connection(run)
+
+    with timed("serialize"):
+        if fmt == "json":
+            return jsonify([dict(zip(columns, row)) for row in rows]), 200
+        return app.response_class(encode_rows(fmt, table, columns, rows), mimetype=OUTPUT_FORMATS[fmt]), 200
+
+# -------------------------------------------------------------------------
+# Data endpoints
+# -------------------------------------------------------------------------
+@app.route("/api/global_energy_substitution", methods=["GET"])
+@cached_response
+def get_global_energy_substitution():
+    """
+    Returns all global energy substitution data, optionally filtered (see FILTERS).
+    Example: /api/global_energy_substitution?year=2020
+    Example: /api/global_energy_substitution?fields=year,solar,wind&limit=500
+    """
+    return table_response("global_energy_substitution")
+
+@app.route("/api/share_renewables", methods=["GET"])
+@cached_response
+def get_share_renewables():
+    """
+    Returns all share of electricity from renewables data, optionally filtered (see FILTERS).
+    Example: /api/share_renewables?year=2020
+    Example: /api/share_renewables?fields=code,renewables_pct_electricity&year=2020
+    Example: /api/share_renewables?code=DEU,FRA&year_from=2000&year_to=2020
+    """
+    return table_response("share_electricity_renewables")
 
 @app.route("/api/per_capita_energy", methods=["GET"])
+@cached_response
 def get_per_capita_energy():
     """
-    Returns all per capita energy data or filtered by year and/or entity if provided.
+    Returns all per capita energy data, optionally filtered (see FILTERS).
     Example: /api/per_capita_energy?year=2020&entity=United States
+    Example: /api/per_capita_energy?entity=France&entity=Germany&year_from=1990
+    Example: /api/per_capita_energy?limit=1000&cursor=<X-Next-Cursor of the previous page>
+    """
+    return table_response("per_capita_energy")
+
+@app.route("/api/<endpoint>/<aggregation>", methods=["GET"])
+@cached_response
+def get_aggregate(endpoint, aggregation):
+    """
+    Returns an aggregation of a data endpoint (see AGGREGATIONS). All of
+    them accept the FILTERS.
+    Example: /api/per_capita_energy/top?year=2023&n=15
+    Example: /api/per_capita_energy/totals?entity=France,Germany
+    Example: /api/global_energy_substitution/yearly?year_from=1950
+    Example: /api/share_renewables/rolling?metric=renewables_pct_electricity&window=5&code=DEU
+    """
+    return aggregate_response(endpoint, aggregation)
+
+@app.route("/api/batch", methods=["POST"])
+def post_batch():
+    """
+    Runs several data queries in one request, on at most one pooled connection.
+    The body is {"queries": [{"endpoint": ..., "params": {...}}, ...]}, where
+    `endpoint` is a data endpoint name (e.g. "per_capita_energy") and
+    `params` takes the same query parameters as that endpoint (lists are
+    allowed for list filters, and their items are taken whole, commas
+    included). Results are JSON, in query order; a query
+    with invalid parameters gets an `error` instead of failing the batch.
+    Example body: {"queries": [{"endpoint": "per_capita_energy",
+                                "params": {"entity": ["France", "Germany"], "year_from": 2000}}]}
     """
-    year_filter = request.args.get("year", None)
-    entity_filter = request.args.get("entity", None)
-    conn = get_db_connection()
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict) or not isinstance(body.get("queries"), list):
+        raise ApiError('Expected a JSON body like {"queries": [{"endpoint": ..., "params": {...}}]}')
+    queries = body["queries"]
+    if not queries or len(queries) > MAX_BATCH_QUERIES:
+        raise ApiError(f"'queries' must hold between 1 and {MAX_BATCH_QUERIES} queries")
+
+    # Validate everything before taking a connection
+    parsed = []
+    for query in queries:
+        try:
+            if not isinstance(query, dict) or query.get("endpoint") not in ENDPOINT_TABLES:
+                raise ApiError(f"'endpoint' must be one of: {', '.join(ENDPOINT_TABLES)}")
+            params = query.get("params") or {}
+            if not isinstance(params, dict):
+                raise ApiError("'params' must be an object")
+            args = MultiDict([
+                (name, escape_list_value(value) if isinstance(values, list) else str(value))
+                for name, values in params.items()
+                for value in (values if isinstance(values, list) else [values])
+            ])
+            table = ENDPOINT_TABLES[query["endpoint"]]
+            parsed.append((table, parse_query(table, args)))
+        except ApiError as error:
+            parsed.append((None, error))
+
+    results = []
+    conn = None  # only taken if some query can't be answered from memory
     try:
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            base_query = "SELECT * FROM per_capita_energy"
-            params = []
-            conditions = []
-
-            if year_filter:
-                conditions.append("year = %s")
-                params.append(year_filter)
-            if entity_filter:
-                conditions.append("entity = %s")
-                params.append(entity_filter)
-
-            if conditions:
-                base_query += " WHERE " + " AND ".join(conditions)
-
-            base_query += " ORDER BY year ASC"
-            cur.execute(base_query, tuple(params))
-            records = cur.fetchall()
+        for table, query in parsed:
+            if table is None:
+                results.append({"error": str(query)})
+                continue
+            page = memory_page(table, *query)
+            if page is None:
+                if conn is None:
+                    conn = get_db_connection()
+                try:
+                    page = fetch_page(conn, table, *query)
+                except Exception as error:
+                    if not connection_lost(conn, error):
+                        raise
+                    # Died since it was last used; retry once on a fresh connection
+                    _count('reconnects')
+                    release_db_connection(conn)
+                    conn = None
+                    conn = get_db_connection()
+                    page = fetch_page(conn, table, *query)
+            records, next_cursor = page
+            results.append({"data": records, "next_cursor": next_cursor})
     finally:
-        conn.close()
+        if conn is not None:
+            release_db_connection(conn)
+    with timed("serialize"):
+        return jsonify({"results": results}), 200
 
-    return jsonify(records), 200
+@app.route("/metrics", methods=["GET"])
+def get_metrics():
+    """
+    Returns request latency, per-phase and per-query histograms, plus pool
+    and cache gauges, in the Prometheus text format.
+    Example: /metrics
+    """
+    return app.response_class(metrics_registry.render(), mimetype="text/plain; version=0.0.4")
+
+@app.route("/api/pool_stats", methods=["GET"])
+def get_pool_stats():
+    """
+    Returns the database connection pool, response cache and columnar
+    snapshot counters.
+    Example: /api/pool_stats
+    """
+    stats = dict(pool_stats(), cache=response_cache.info())
+    if COLUMNAR_CONFIG['enabled']:
+        stats['columnar'] = columnar_store.info()
+    return jsonify(stats), 200
 
 if __name__ == "__main__":
     app.run(debug=True)
@@ -0,0 +1,169 @@
+# asgi_app.py
+
+import contextlib
+from urllib.parse import urlencode
+
+import asyncpg
+from starlette.applications import Starlette
+from starlette.responses import Response, StreamingResponse
+from starlette.routing import Route
+from werkzeug.datastructures import MIMEAccept, MultiDict
+from werkzeug.http import parse_accept_header
+
+# Query parsing, SQL building and encoding are shared with the Flask app,
+# so both servers accept the same parameters and return the same bytes
+import app as wsgi
+from app import (
+    DB_CONFIG, ENDPOINT_TABLES, OUTPUT_FORMATS, STREAM_BATCH_SIZE, ApiError,
+    _finish_page, build_select, encode_rows, negotiate_format, parse_query, selected_columns,
+)
+
+# -------------------------------------------------------------------------
+# ASGI entry point serving the data endpoints of app.py from an asyncpg
+# pool. A slow query only holds a connection, not a worker thread, so one
+# process can keep many queries in flight. Run with:
+#     uvicorn asgi_app:app --port 8000
+# -------------------------------------------------------------------------
+ASYNC_POOL_CONFIG = {
+    'min_size': 1,              # connections opened at startup
+    'max_size': 20,             # upper bound on connections held by this process
+    'checkout_timeout': 10,     # seconds to wait for a free connection before failing
+    'command_timeout': 60,      # seconds before a query is cancelled
+}
+
+_pool = None
+
+def to_asyncpg(query):
+    """
+    Rewrites the %s placeholders of build_select() as asyncpg's $1, $2, ...
+    """
+    parts = query.split("%s")
+    return parts[0] + "".join(f"${i}{part}" for i, part in enumerate(parts[1:], 1))
+
+def dumps(records):
+    """
+    Serializes records as Flask's jsonify() does with compact output, its
+    default outside debug mode.
+    """
+    return wsgi.app.json.dumps(records, separators=(",", ":")) + "\n"
+
+def error_response(error):
+    return Response(dumps({"error": str(error)}), status_code=error.status, media_type="application/json")
+
+async def stream_records(conn, query, params, columns):
+    """
+    Yields a JSON array of the query's rows, read from a server-side cursor
+    STREAM_BATCH_SIZE rows at a time; the async twin of app.stream_records().
+    The connection goes back to the pool when the stream ends or the client
+    disconnects.
+    """
+    try:
+        async with conn.transaction():
+            cursor = await conn.cursor(to_asyncpg(query), *params)
+            yield "["
+            separator = ""
+            while True:
+                rows = await cursor.fetch(STREAM_BATCH_SIZE)
+                if not rows:
+                    break
+                batch = wsgi.app.json.dumps([dict(zip(columns, row)) for row in rows], separators=(",", ":"))
+                yield separator + batch[1:-1]
+                separator = ","
+            yield "]\n"
+    finally:
+        await _pool.release(conn)
+
+async def _prepend(first, chunks):
+    try:
+        yield first
+        async for chunk in chunks:
+            yield chunk
+    finally:
+        await chunks.aclose()
+
+async def fetch_page(conn, table, fields, filters, limit, after, as_dicts=True):
+    """
+    The asyncpg version of app.fetch_page().
+    """
+    query, params = build_select(table, fields, filters, limit, after)
+    columns = selected_columns(fields, limit)
+    rows = await conn.fetch(to_asyncpg(query), *params)
+    records = [dict(zip(columns, row)) for row in rows] if as_dicts else [tuple(row) for row in rows]
+    return _finish_page(records, columns, fields, limit, as_dicts)
+
+async def table_response(request, table):
+    """
+    Same behaviour as app.table_response(): projection, filters, keyset
+    pagination, output formats, and streaming of full JSON tables.
+    """
+    args = MultiDict(request.query_params.multi_items())
+    try:
+        fields, filters, limit, after = parse_query(table, args)
+        fmt = negotiate_format(args, parse_accept_header(request.headers.get("accept"), MIMEAccept))
+        if fmt in ("arrow", "parquet") and wsgi.pa is None:
+            raise ApiError(f"format={fmt} requires pyarrow, which is not installed on the server", status=406)
+    except ApiError as error:
+        return error_response(error)
+
+    conn = await _pool.acquire(timeout=ASYNC_POOL_CONFIG['checkout_timeout'])
+    if fmt == "json" and not filters and limit is None:
+        query, params = build_select(table, fields, filters)
+        chunks = stream_records(conn, query, params, fields)
+        # Start the stream here so query errors still become a normal 500
+        first = await chunks.__anext__()
+        return StreamingResponse(_prepend(first, chunks), media_type="application/json")
+
+    try:
+        records, next_cursor = await fetch_page(conn, table, fields, filters, limit, after, as_dicts=fmt == "json")
+    finally:
+        await _pool.release(conn)
+
+    if fmt == "json":
+        response = Response(dumps(records), media_type="application/json")
+    else:
+        response = Response(encode_rows(fmt, table, fields, records), media_type=OUTPUT_FORMATS[fmt])
+
+    if next_cursor:
+        query_args = args.to_dict(flat=False)
+        query_args["cursor"] = [next_cursor]
+        response.headers["X-Next-Cursor"] = next_cursor
+        response.headers["Link"] = f'<{request.url.path}?{urlencode(query_args, doseq=True)}>; rel="next"'
+    return response
+
+# -------------------------------------------------------------------------
+# Data endpoints (the same paths as app.py)
+# -------------------------------------------------------------------------
+def data_endpoint(table):
+    async def endpoint(request):
+        return await table_response(request, table)
+    return endpoint
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    global _pool
+    _pool = await asyncpg.create_pool(
+        host=DB_CONFIG['host'],
+        database=DB_CONFIG['dbname'],
+        user=DB_CONFIG['user'],
+        password=DB_CONFIG['password'],
+        port=DB_CONFIG['port'],
+        min_size=ASYNC_POOL_CONFIG['min_size'],
+        max_size=ASYNC_POOL_CONFIG['max_size'],
+        command_timeout=ASYNC_POOL_CONFIG['command_timeout'],
+    )
+    try:
+        yield
+    finally:
+        await _pool.close()
+
+app = Starlette(
+    routes=[
+        Route(f"/api/{endpoint}", data_endpoint(table), methods=["GET"])
+        for endpoint, table in ENDPOINT_TABLES.items()
+    ],
+    lifespan=lifespan,
+)
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="127.0.0.1", port=8000)
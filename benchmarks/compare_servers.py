@@ -0,0 +1,64 @@
+# benchmarks/compare_servers.py
+
+import argparse
+import asyncio
+import json
+
+from load import DEFAULT_PATHS, run_load
+
+# -------------------------------------------------------------------------
+# Compares the WSGI app (app.py) with the ASGI app (asgi_app.py) at several
+# concurrency levels. Start both servers against the same database first,
+# for example:
+#     gunicorn -w 4 --threads 8 -b 127.0.0.1:5000 app:app
+#     uvicorn asgi_app:app --port 8000 --workers 4
+# The ASGI app has no response cache, so by default requests are made
+# unique (--bust-cache) and both servers run every query.
+# -------------------------------------------------------------------------
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the WSGI and ASGI servers side by side")
+    parser.add_argument("--wsgi-url", default="http://127.0.0.1:5000")
+    parser.add_argument("--asgi-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--concurrency", default="10,100,1000",
+                        help="comma-separated client counts")
+    parser.add_argument("--duration", type=float, default=20.0, help="measured seconds per run")
+    parser.add_argument("--warmup", type=float, default=2.0)
+    parser.add_argument("--path", action="append", dest="paths")
+    parser.add_argument("--keep-cache", action="store_true",
+                        help="let the WSGI response cache answer repeated requests")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    levels = [int(n) for n in args.concurrency.split(",")]
+    servers = {"wsgi": args.wsgi_url, "asgi": args.asgi_url}
+
+    results = []
+    for concurrency in levels:
+        for server, url in servers.items():
+            print(f"{server} @ {concurrency} clients ...")
+            result = asyncio.run(run_load(
+                url, args.paths or DEFAULT_PATHS, concurrency, args.duration, args.warmup,
+                bust_cache=not args.keep_cache,
+            ))
+            results.append(dict(result, server=server))
+
+    print(f"\n{'server':<6} {'clients':>7} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for r in results:
+        latency = r["latency_ms"]
+        print(f"{r['server']:<6} {r['concurrency']:>7} {r['throughput_rps']:>9} "
+              f"{latency['p50'] or '-':>9} {latency['p95'] or '-':>9} {latency['p99'] or '-':>9} "
+              f"{sum(r['errors'].values()):>7}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
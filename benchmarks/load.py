@@ -0,0 +1,123 @@
+# benchmarks/load.py
+
+import argparse
+import asyncio
+import itertools
+import json
+import time
+
+import httpx
+
+# -------------------------------------------------------------------------
+# HTTP load driver: keeps `concurrency` clients busy against an API for a
+# fixed time and reports throughput and latency percentiles. Works against
+# either server (app.py under a WSGI server, or asgi_app.py under uvicorn).
+# -------------------------------------------------------------------------
+DEFAULT_PATHS = [
+    "/api/per_capita_energy?year=2020",
+    "/api/share_renewables?year=2020",
+    "/api/global_energy_substitution?limit=500",
+    "/api/per_capita_energy?entity=France,Germany&year_from=1990",
+]
+
+
+def percentile(sorted_values, pct):
+    """
+    Nearest-rank percentile of an already sorted list.
+    """
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def summarize(latencies, errors, elapsed):
+    """
+    Turns raw latencies (seconds) into the report fields.
+    """
+    latencies.sort()
+    ms = [round(v * 1000, 2) for v in latencies]
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "latency_ms": {
+            "mean": round(sum(ms) / len(ms), 2) if ms else None,
+            "p50": percentile(ms, 50),
+            "p95": percentile(ms, 95),
+            "p99": percentile(ms, 99),
+            "max": ms[-1] if ms else None,
+        },
+    }
+
+
+async def run_load(base_url, paths=None, concurrency=10, duration=10.0, warmup=1.0,
+                   timeout=30.0, bust_cache=False, headers=None):
+    """
+    Runs `concurrency` clients in a loop over `paths` for `duration`
+    seconds, after a `warmup` whose requests are not counted. With
+    `bust_cache`, every request gets a unique dummy parameter, so the
+    server's response cache can't answer it.
+    Returns a dict with the request count, errors, throughput and latency
+    percentiles.
+    """
+    paths = paths or DEFAULT_PATHS
+    counter = itertools.count()
+    latencies, errors = [], {}
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits, headers=headers) as client:
+        start = time.perf_counter()
+        measure_from = start + warmup
+        stop = measure_from + duration
+
+        async def worker():
+            while True:
+                n = next(counter)
+                path = paths[n % len(paths)]
+                if bust_cache:
+                    path += ("&" if "?" in path else "?") + f"_nocache={n}"
+                sent = time.perf_counter()
+                if sent >= stop:
+                    return
+                try:
+                    response = await client.get(path)
+                    await response.aread()
+                    failure = None if response.status_code < 400 else f"HTTP {response.status_code}"
+                except httpx.HTTPError as e:
+                    failure = type(e).__name__
+                if sent < measure_from:
+                    continue
+                if failure:
+                    errors[failure] = errors.get(failure, 0) + 1
+                else:
+                    latencies.append(time.perf_counter() - sent)
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - measure_from
+
+    return dict(
+        {"base_url": base_url, "concurrency": concurrency, "duration_s": round(elapsed, 2)},
+        **summarize(latencies, errors, elapsed),
+    )
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Drive concurrent HTTP load against the energy API")
+    parser.add_argument("base_url", help="e.g. http://127.0.0.1:5000")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--duration", type=float, default=10.0, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=1.0, help="unmeasured seconds first")
+    parser.add_argument("--path", action="append", dest="paths",
+                        help="request path (repeatable); defaults to a mix of filtered queries")
+    parser.add_argument("--bust-cache", action="store_true",
+                        help="make every request unique so response caches are bypassed")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    result = asyncio.run(run_load(
+        args.base_url, args.paths, args.concurrency, args.duration, args.warmup, bust_cache=args.bust_cache
+    ))
+    print(json.dumps(result, indent=2))
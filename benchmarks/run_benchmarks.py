@@ -0,0 +1,195 @@
+# benchmarks/run_benchmarks.py
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+import requests
+
+from load import run_load
+from seed import SCALES, sample_space, seed_postgres
+
+# -------------------------------------------------------------------------
+# Benchmark suite for app.py: for each data scale, seed the data, start the
+# API, drive each scenario (a filter mix) at each concurrency level and
+# write the throughput and latency percentiles as JSON, stamped with the
+# git commit so runs can be compared across commits.
+# -------------------------------------------------------------------------
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Scenario name -> request path templates. {entity}, {code} and {year}
+# placeholders are filled with values that exist at the chosen scale.
+SCENARIOS = {
+    "year": [
+        "/api/per_capita_energy?year={year}",
+        "/api/share_renewables?year={year}",
+        "/api/global_energy_substitution?year={year}",
+    ],
+    "year_range": [
+        "/api/share_renewables?year_from={year}&year_to={year2}&fields=entity,year,renewables_pct_electricity",
+        "/api/per_capita_energy?year_from={year}&year_to={year2}&limit=1000",
+    ],
+    "entities": [
+        "/api/per_capita_energy?entity={entity},{entity2},{entity3}",
+        "/api/share_renewables?entity={entity}&year_from={year}",
+        "/api/share_renewables?code={code},{code2}",
+    ],
+    "pages": [
+        "/api/per_capita_energy?limit=1000",
+        "/api/share_renewables?limit=1000&format=csv",
+    ],
+    "full_table": [
+        "/api/share_renewables",
+        "/api/per_capita_energy",
+    ],
+    "aggregates": [  # PostgreSQL only: aggregations always run in SQL
+        "/api/per_capita_energy/top?year={year}&n=15",
+        "/api/global_energy_substitution/yearly?year_from={year}",
+        "/api/share_renewables/rolling?entity={entity}&window=5",
+    ],
+}
+STANDIN_SCENARIOS = [name for name in SCENARIOS if name != "aggregates"]
+PATHS_PER_SCENARIO = 200    # distinct filled-in paths cycled through per scenario
+
+
+def build_paths(scenario, space, count=PATHS_PER_SCENARIO, seed=0):
+    """
+    Fills the scenario's templates with random values from `space`
+    (see seed.sample_space), cycling through the templates.
+    """
+    rng = random.Random(seed)
+    templates = SCENARIOS[scenario]
+    paths = []
+    for i in range(count):
+        year, year2 = sorted(rng.sample(space["years"], 2))
+        entity, entity2, entity3 = rng.sample(space["entities"], 3)
+        code, code2 = rng.sample(space["codes"], 2)
+        paths.append(templates[i % len(templates)].format(
+            year=year, year2=year2, entity=entity, entity2=entity2, entity3=entity3, code=code, code2=code2,
+        ).replace(" ", "%20"))
+    return paths
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=HERE, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def start_server(backend, scale, port, startup_timeout=600):
+    """
+    Starts serve.py in a separate process (so the server and the load
+    driver don't share an interpreter) and waits until it answers.
+    """
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(HERE, "serve.py"), "--backend", backend,
+         "--scale", str(scale), "--port", str(port)],
+    )
+    deadline = time.monotonic() + startup_timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"serve.py exited with code {process.returncode}")
+        try:
+            if requests.get(f"http://127.0.0.1:{port}/api/pool_stats", timeout=1).ok:
+                return process
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    process.terminate()
+    raise RuntimeError("serve.py did not start in time")
+
+
+def run_suite(backend="standin", scales=SCALES, scenarios=None, concurrency=(1, 10, 50),
+              duration=10.0, warmup=2.0, base_url=None, port=5099, bust_cache=True):
+    """
+    Runs every scenario at every concurrency level for each scale and
+    returns the report dict.
+    """
+    scenarios = scenarios or (STANDIN_SCENARIOS if backend == "standin" else list(SCENARIOS))
+    results = []
+    for scale in scales:
+        process = None
+        if base_url is None:
+            if backend == "postgres":
+                seed_postgres(scale)
+            process = start_server(backend, scale, port)
+        url = base_url or f"http://127.0.0.1:{port}"
+        space = sample_space(scale)
+        try:
+            for scenario in scenarios:
+                paths = build_paths(scenario, space)
+                for clients in concurrency:
+                    print(f"scale {scale}x, {scenario}, {clients} clients ...", flush=True)
+                    result = asyncio.run(run_load(url, paths, clients, duration, warmup, bust_cache=bust_cache))
+                    results.append(dict(result, scale=scale, scenario=scenario))
+        finally:
+            if process is not None:
+                process.terminate()
+                process.wait()
+
+    return {
+        "commit": git_commit(),
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "backend": backend,
+        "python": platform.python_version(),
+        "duration_s": duration,
+        "cache_bypassed": bust_cache,
+        "results": results,
+    }
+
+
+def print_summary(report):
+    print(f"\n{'scale':>5} {'scenario':<11} {'clients':>7} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for r in report["results"]:
+        latency = r["latency_ms"]
+        print(f"{r['scale']:>5} {r['scenario']:<11} {r['concurrency']:>7} {r['throughput_rps']:>9} "
+              f"{latency['p50'] or '-':>9} {latency['p95'] or '-':>9} {latency['p99'] or '-':>9} "
+              f"{sum(r['errors'].values()):>7}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Load-test the energy API at several data scales.")
+    parser.add_argument("--backend", choices=["standin", "postgres"], default="standin",
+                        help="standin: in-memory synthetic data, no database; "
+                             "postgres: seed the benchmark database (BENCHMARK_DBNAME, default energy_benchmark)")
+    parser.add_argument("--scales", default=",".join(map(str, SCALES)))
+    parser.add_argument("--scenarios", help=f"comma-separated, from: {', '.join(SCENARIOS)}")
+    parser.add_argument("--concurrency", default="1,10,50")
+    parser.add_argument("--duration", type=float, default=10.0, help="measured seconds per run")
+    parser.add_argument("--warmup", type=float, default=2.0)
+    parser.add_argument("--base-url", help="benchmark an already running server instead (one scale)")
+    parser.add_argument("--keep-cache", action="store_true",
+                        help="let the response cache answer repeated requests")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    report = run_suite(
+        backend=args.backend,
+        scales=[int(s) for s in args.scales.split(",")],
+        scenarios=args.scenarios.split(",") if args.scenarios else None,
+        concurrency=[int(c) for c in args.concurrency.split(",")],
+        duration=args.duration,
+        warmup=args.warmup,
+        base_url=args.base_url,
+        bust_cache=not args.keep_cache,
+    )
+    print_summary(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report saved to {args.output}")
+    else:
+        print(json.dumps(report, indent=2))
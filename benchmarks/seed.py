@@ -0,0 +1,183 @@
+# benchmarks/seed.py
+
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import psycopg2
+from psycopg2 import sql
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import DB_CONFIG
+from columnar import ColumnarTable, Snapshot
+from ingestion import PANDAS_DTYPES, create_tables, write_rows
+from schema import TABLE_SPECS, api_columns, column_names, value_columns
+
+# -------------------------------------------------------------------------
+# Synthetic datasets shaped like the three OWID tables. At scale 1 each
+# table has roughly as many entities and years as the real download;
+# larger scales multiply the number of entities.
+# -------------------------------------------------------------------------
+BASE_SHAPES = {
+    # table: (entities, first year, last year)
+    "global_energy_substitution": (1, 1800, 2023),
+    "share_electricity_renewables": (220, 1985, 2023),
+    "per_capita_energy": (280, 1965, 2023),
+}
+SCALES = (1, 10, 100)
+
+# Synthetic data goes into a database of its own. Seeding the database
+# app.py serves would leave ingestion_metadata there holding the real
+# sources' hashes, so `ingestion.py --incremental` would skip every dataset
+# and keep serving the synthetic rows.
+BENCHMARK_DB_CONFIG = dict(DB_CONFIG, dbname=os.environ.get("BENCHMARK_DBNAME", "energy_benchmark"))
+SERVING_DB_CONFIG = dict(DB_CONFIG)
+NULL_FRACTION = 0.1     # share of missing measurement values
+REGION_EVERY = 7        # every 7th entity is a region without a country code
+
+
+def entity_names(count):
+    """
+    Entity names shared by all tables: "World", then numbered entities.
+    """
+    return ["World"] + [f"Entity {i:06d}" for i in range(1, count)]
+
+
+def entity_code(i):
+    if i == 0:
+        return "OWID_WRL"
+    return None if i % REGION_EVERY == 0 else f"E{i:06d}"
+
+
+def table_shape(table, scale=1):
+    """
+    Returns (entities, first year, last year) of `table` at `scale`.
+    """
+    entities, first, last = BASE_SHAPES[table]
+    return entities * scale, first, last
+
+
+def synthetic_table(table, scale=1, seed=0):
+    """
+    Returns a DataFrame with the target columns of `table` (see schema.py),
+    typed as ingestion.py parses them. Deterministic for a given seed.
+    """
+    rng = np.random.default_rng(seed)
+    entities, first, last = table_shape(table, scale)
+    years = np.arange(first, last + 1)
+    names = entity_names(entities)
+
+    entity_index = np.repeat(np.arange(entities), len(years))
+    data = {
+        "entity": pd.array([names[i] for i in entity_index], dtype=PANDAS_DTYPES["TEXT"]),
+        "code": pd.array([entity_code(i) for i in entity_index], dtype=PANDAS_DTYPES["TEXT"]),
+        "year": pd.array(np.tile(years, entities), dtype=PANDAS_DTYPES["INT"]),
+    }
+    for column in value_columns(table):
+        values = rng.gamma(2.0, 500.0, size=len(entity_index))
+        values[rng.random(len(values)) < NULL_FRACTION] = np.nan
+        data[column] = values
+    return pd.DataFrame(data)[column_names(table)]
+
+
+def same_database(a, b):
+    """
+    True when two connection settings name the same database on the same server.
+    """
+    return all(str(a.get(key)) == str(b.get(key)) for key in ("host", "port", "dbname"))
+
+
+def create_database(db_config):
+    """
+    Creates the database of `db_config` on its server if it doesn't exist.
+    """
+    admin = psycopg2.connect(**dict(db_config, dbname="postgres"))
+    admin.autocommit = True
+    try:
+        with admin.cursor() as cur:
+            cur.execute("SELECT 1 FROM pg_database WHERE datname = %s", (db_config["dbname"],))
+            if cur.fetchone() is None:
+                cur.execute(sql.SQL("CREATE DATABASE {}").format(sql.Identifier(db_config["dbname"])))
+                print(f"Created database {db_config['dbname']}")
+    finally:
+        admin.close()
+
+
+def seed_postgres(scale, conn=None, seed=0, batch_size=100_000, db_config=None, allow_serving_db=False):
+    """
+    Replaces the three tables in the benchmark database (`db_config`,
+    BENCHMARK_DB_CONFIG by default, or the database of `conn`) with
+    synthetic data at `scale`, through the normal ingestion path (staging
+    load, indexes, views, data version bump). The stored source metadata
+    is cleared, so a later incremental ingestion into the same database
+    reloads the real data. The database app.py serves is refused unless
+    `allow_serving_db` is set.
+    """
+    own_conn = conn is None
+    db_config = db_config or BENCHMARK_DB_CONFIG
+    target = db_config if own_conn else conn.get_dsn_parameters()
+    if same_database(target, SERVING_DB_CONFIG) and not allow_serving_db:
+        raise ValueError(
+            f"Refusing to seed {target['dbname']}, the database app.py serves; "
+            "set BENCHMARK_DBNAME to another database"
+        )
+    if own_conn:
+        create_database(db_config)
+        conn = psycopg2.connect(**db_config)
+    try:
+        create_tables(conn)
+        with conn.cursor() as cur:
+            cur.execute("DELETE FROM ingestion_metadata;")
+        conn.commit()
+        for table in TABLE_SPECS:
+            df = synthetic_table(table, scale, seed)
+            batches = (df.iloc[i:i + batch_size] for i in range(0, len(df), batch_size))
+            write_rows(conn, table, batches)
+            print(f"Seeded {len(df)} rows into {table} (scale {scale}x)")
+    finally:
+        if own_conn:
+            conn.close()
+
+
+def seed_standin(scale, seed=0, version=1):
+    """
+    Builds an in-memory columnar snapshot (see columnar.py) holding the
+    same synthetic data, for benchmarking app.py without a database.
+    """
+    tables = {}
+    for table in TABLE_SPECS:
+        df = synthetic_table(table, scale, seed)
+        df.insert(0, "id", np.arange(1, len(df) + 1))
+        df = df.sort_values(["entity", "year"], kind="stable")
+        df = df.astype(object).where(df.notna(), None)
+        rows = list(df[api_columns(table)].itertuples(index=False, name=None))
+        tables[table] = ColumnarTable(table, api_columns(table), rows)
+        print(f"Built {len(rows)} in-memory rows of {table} (scale {scale}x)")
+    return Snapshot(version, tables)
+
+
+def sample_space(scale):
+    """
+    Returns the entities, codes and years present at `scale`, for building
+    request paths that match data.
+    """
+    entities, first, last = table_shape("share_electricity_renewables", scale)
+    codes = [c for c in (entity_code(i) for i in range(entities)) if c]
+    return {"entities": entity_names(entities), "codes": codes, "years": list(range(first, last + 1))}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Seed the benchmark database (BENCHMARK_DBNAME, default energy_benchmark) with synthetic energy data."
+    )
+    parser.add_argument("--scale", type=int, default=1, help=f"size multiplier, e.g. one of {SCALES}")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--allow-serving-db", action="store_true",
+                        help="seed the database of app.DB_CONFIG even though the API serves it")
+    args = parser.parse_args()
+    seed_postgres(args.scale, seed=args.seed,
+                  db_config=SERVING_DB_CONFIG if args.allow_serving_db else None,
+                  allow_serving_db=args.allow_serving_db)
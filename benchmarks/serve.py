@@ -0,0 +1,51 @@
+# benchmarks/serve.py
+
+import argparse
+import logging
+import os
+import sys
+import time
+
+from werkzeug.serving import make_server
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app
+from seed import BENCHMARK_DB_CONFIG, seed_standin
+
+# -------------------------------------------------------------------------
+# Serves app.py for a benchmark run, either against the benchmark database
+# (see seed.BENCHMARK_DB_CONFIG) or against the in-memory stand-in, both
+# seeded with synthetic data.
+# -------------------------------------------------------------------------
+
+
+def install_standin(snapshot):
+    """
+    Points app.py at an in-memory snapshot: the data endpoints are answered
+    by columnar serving and the data version is pinned to the snapshot's,
+    so no database is needed. Aggregations still need PostgreSQL.
+    """
+    app.COLUMNAR_CONFIG['enabled'] = True
+    app.columnar_store.snapshot = snapshot
+    app.CACHE_CONFIG['version_check_interval'] = float("inf")
+    app._version_state.update(version=snapshot.version, checked_at=time.monotonic())
+    app.response_cache.set_version(snapshot.version)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve app.py for benchmarking.")
+    parser.add_argument("--backend", choices=["postgres", "standin"], default="postgres")
+    parser.add_argument("--scale", type=int, default=1, help="stand-in data size multiplier")
+    parser.add_argument("--port", type=int, default=5000)
+    args = parser.parse_args()
+
+    if args.backend == "standin":
+        install_standin(seed_standin(args.scale))
+    else:
+        app.DB_CONFIG.update(BENCHMARK_DB_CONFIG)
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)  # no per-request access log
+    server = make_server("127.0.0.1", args.port, app.app, threaded=True)
+    print(f"Serving app.py ({args.backend}, scale {args.scale}x) on http://127.0.0.1:{args.port}", flush=True)
+    server.serve_forever()
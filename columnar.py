@@ -0,0 +1,281 @@
+# columnar.py
+
+import threading
+import time
+
+import numpy as np
+
+from schema import TABLE_SPECS, column_types
+
+# -------------------------------------------------------------------------
+# In-memory, read-only copy of the data tables for app.py.
+#
+# Each table is held as NumPy columns sorted like the API's results
+# (ORDER BY year, entity). Text columns are dictionary-encoded: an array of
+# integer codes into a list of unique strings, with -1 for NULL. Every
+# column has a NULL mask next to its values, so results are exactly what
+# psycopg2 would return for the same query.
+# -------------------------------------------------------------------------
+NUMPY_DTYPES = {"INT": np.int64, "FLOAT": np.float64}
+
+
+class ColumnarTable:
+    """
+    One table's columns, plus the indexes used to answer the API filters:
+    rows are sorted by (year, entity), so a year range is a slice found with
+    a binary search, and `entity_rows` lists the rows of each entity (in the
+    same order) so an entity lookup never scans the table.
+    """
+
+    def __init__(self, table, names, rows):
+        """
+        Builds the table from query result tuples. `rows` must be sorted by
+        entity (as Postgres collates it), then year: dictionary codes are
+        handed out in that order, so sorting codes sorts the strings the
+        same way the database does.
+        """
+        self.table = table
+        self.types = dict(column_types(table), id="INT")
+        self.dictionaries = {}   # text column -> list of unique values
+        self.lookups = {}        # text column -> {value: code}
+        self.values = {}         # column -> NumPy array (codes for text columns)
+        self.nulls = {}          # column -> boolean NULL mask
+
+        raw = dict(zip(names, zip(*rows))) if rows else {name: () for name in names}
+        for name in names:
+            self._add_column(name, raw[name])
+
+        # Sort key of each row: NULLs last, as with ORDER BY ... ASC
+        self._year_key = np.where(self.nulls["year"], np.iinfo(np.int64).max, self.values["year"])
+        self._entity_key = np.where(self.nulls["entity"], len(self.dictionaries["entity"]), self.values["entity"])
+        order = np.lexsort((self._entity_key, self._year_key))
+        for name in names:
+            self.values[name] = self.values[name][order]
+            self.nulls[name] = self.nulls[name][order]
+        self._year_key = self._year_key[order]
+        self._entity_key = self._entity_key[order]
+
+        # Rows of each entity code, in result order
+        self.entity_rows = np.argsort(self._entity_key, kind="stable")
+        self.entity_bounds = np.searchsorted(
+            self._entity_key[self.entity_rows], np.arange(len(self.dictionaries["entity"]) + 2)
+        )
+        self.size = len(order)
+
+    def _add_column(self, name, column):
+        if self.types[name] == "TEXT":
+            lookup = {}
+            codes = np.fromiter(
+                (-1 if value is None else lookup.setdefault(value, len(lookup)) for value in column),
+                dtype=np.int32, count=len(column),
+            )
+            self.lookups[name] = lookup
+            self.dictionaries[name] = list(lookup)
+            self.values[name] = codes
+            self.nulls[name] = codes < 0
+        else:
+            nulls = np.fromiter((value is None for value in column), dtype=bool, count=len(column))
+            self.values[name] = np.array(
+                [0 if value is None else value for value in column], dtype=NUMPY_DTYPES[self.types[name]]
+            )
+            self.nulls[name] = nulls
+
+    def nbytes(self):
+        """
+        Returns the memory held by the columns and indexes (dictionaries excluded).
+        """
+        arrays = list(self.values.values()) + list(self.nulls.values())
+        arrays += [self._year_key, self._entity_key, self.entity_rows, self.entity_bounds]
+        return sum(array.nbytes for array in arrays)
+
+    def _codes(self, column, values):
+        lookup = self.lookups[column]
+        return np.array([lookup[v] for v in values if v in lookup], dtype=np.int64)
+
+    def select(self, columns, filters, limit=None, after=None):
+        """
+        Answers build_select() (app.py) from memory: `filters` is the output
+        of parse_filters(), `limit` the number of rows to return and `after`
+        a keyset position. Returns result tuples of `columns`, or None when
+        the query can't be answered exactly (a cursor naming an entity this
+        copy doesn't have); the caller then asks the database.
+        """
+        # Candidate rows from the indexes, in result order
+        if "entity" in filters:
+            codes = self._codes("entity", filters["entity"])
+            rows = np.sort(np.concatenate(
+                [self.entity_rows[self.entity_bounds[c]:self.entity_bounds[c + 1]] for c in codes]
+                + [np.empty(0, dtype=np.int64)]
+            ))
+        else:
+            rows = np.arange(self.size)
+
+        year_from, year_to = filters.get("year_from"), filters.get("year_to")
+        if year_from is not None or year_to is not None:
+            keys = self._year_key[rows]
+            start = 0 if year_from is None else np.searchsorted(keys, year_from, side="left")
+            stop = np.searchsorted(keys, year_to, side="right") if year_to is not None \
+                else np.searchsorted(keys, np.iinfo(np.int64).max, side="left")
+            rows = rows[start:stop]
+
+        mask = np.ones(len(rows), dtype=bool)
+        if "year" in filters:
+            mask &= ~self.nulls["year"][rows] & np.isin(self.values["year"][rows], filters["year"])
+        if "code" in filters:
+            mask &= np.isin(self.values["code"][rows], self._codes("code", filters["code"]))
+
+        if after is not None:
+            after_year, after_entity = after
+            year = self.values["year"][rows]
+            later = ~self.nulls["year"][rows] & (year > after_year)
+            if after_entity is not None:
+                if after_entity not in self.lookups["entity"]:
+                    return None
+                entity = self._entity_key[rows]
+                later |= (~self.nulls["year"][rows] & (year == after_year)
+                          & ~self.nulls["entity"][rows] & (entity > self.lookups["entity"][after_entity]))
+            mask &= later
+
+        rows = rows[mask]
+        if limit is not None:
+            rows = rows[:limit]
+        return list(zip(*(self._column_values(column, rows) for column in columns)))
+
+    def _column_values(self, column, rows):
+        values = self.values[column][rows]
+        nulls = self.nulls[column][rows]
+        if column in self.dictionaries:
+            dictionary = self.dictionaries[column]
+            return [None if code < 0 else dictionary[code] for code in values.tolist()]
+        values = values.tolist()  # Python ints and floats, as psycopg2 returns
+        if nulls.any():
+            for i in np.flatnonzero(nulls).tolist():
+                values[i] = None
+        return values
+
+
+class Snapshot:
+    """
+    All tables as of one data version. Never modified once built.
+    """
+
+    def __init__(self, version, tables):
+        self.version = version
+        self.tables = tables
+        self.loaded_at = time.time()
+
+
+def load_snapshot(conn):
+    """
+    Reads the data version and every table in one read-only, repeatable-read
+    transaction, so the snapshot matches the version it is stamped with.
+    """
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY")
+            cur.execute("SELECT version FROM data_version WHERE id = 1")
+            version = cur.fetchone()[0]
+            tables = {}
+            for table in TABLE_SPECS:
+                names = ["id"] + [target for _, target, _ in TABLE_SPECS[table]["columns"]]
+                # Entity order here defines the dictionary codes (see ColumnarTable)
+                cur.execute(f"SELECT {', '.join(names)} FROM {table} ORDER BY entity ASC, year ASC")
+                tables[table] = ColumnarTable(table, names, cur.fetchall())
+    finally:
+        conn.rollback()
+    return Snapshot(version, tables)
+
+
+class ColumnarStore:
+    """
+    Holds the current Snapshot and replaces it when a newer data version is
+    published. A reload builds a complete new snapshot off to the side and
+    then swaps one reference, so readers see either the old data or the new
+    data, never a mix.
+    """
+
+    def __init__(self, connect, release, retry_after=30):
+        self._connect = connect
+        self._release = release
+        self.retry_after = retry_after    # seconds before a failed first load is tried again
+        self._retry_at = 0.0
+        self._lock = threading.Lock()
+        self._loading = False
+        self.snapshot = None
+        self.stats = {'loads': 0, 'load_errors': 0, 'last_load_seconds': None}
+
+    def reload(self):
+        """
+        Loads a fresh snapshot now and publishes it.
+        """
+        started = time.perf_counter()
+        conn = self._connect()
+        try:
+            snapshot = load_snapshot(conn)
+        finally:
+            self._release(conn)
+        self.snapshot = snapshot
+        self.stats['loads'] += 1
+        self.stats['last_load_seconds'] = round(time.perf_counter() - started, 3)
+        print(f"Columnar snapshot of data version {snapshot.version} loaded "
+              f"in {self.stats['last_load_seconds']}s")
+        return snapshot
+
+    def _reload_in_background(self):
+        try:
+            self.reload()
+        except Exception as e:
+            self.stats['load_errors'] += 1
+            print(f"Columnar snapshot reload failed: {e}")
+        finally:
+            with self._lock:
+                self._loading = False
+
+    def get(self, version):
+        """
+        Returns the snapshot for data `version`, or None when it isn't
+        loaded (yet). The first call loads synchronously; later version
+        changes reload in a background thread while callers fall back to
+        the database. After a failed first load, callers use the database
+        for `retry_after` seconds rather than each retrying the load.
+        """
+        snapshot = self.snapshot
+        if snapshot is not None and snapshot.version == version:
+            return snapshot
+        if snapshot is None:
+            if time.monotonic() < self._retry_at:
+                return None
+            with self._lock:
+                snapshot = self.snapshot
+                if snapshot is None:
+                    if time.monotonic() < self._retry_at:
+                        return None  # failed while this caller waited for the lock
+                    try:
+                        snapshot = self.reload()
+                    except Exception as e:
+                        self.stats['load_errors'] += 1
+                        self._retry_at = time.monotonic() + self.retry_after
+                        print(f"Columnar snapshot load failed: {e}; retrying in {self.retry_after}s")
+                        return None
+            return snapshot if snapshot.version == version else None
+        if snapshot.version < version:
+            with self._lock:
+                if self._loading:
+                    return None
+                self._loading = True
+            threading.Thread(target=self._reload_in_background, daemon=True).start()
+        return None
+
+    def info(self):
+        """
+        Returns the load counters and the size of the current snapshot.
+        """
+        snapshot = self.snapshot
+        info = dict(self.stats, loading=self._loading)
+        if snapshot is not None:
+            info.update(
+                version=snapshot.version,
+                rows={table: t.size for table, t in snapshot.tables.items()},
+                bytes=sum(t.nbytes() for t in snapshot.tables.values()),
+            )
+        return info
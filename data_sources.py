@@ -0,0 +1,217 @@
+# data_sources.py
+
+import io
+
+import numpy as np
+import pandas as pd
+import psycopg2
+import requests
+from werkzeug.datastructures import MultiDict
+
+from app import (
+    AGGREGATE_COLUMN_TYPES, AGGREGATIONS, DB_CONFIG, ENDPOINT_TABLES, FILTERS, MAX_TOP_N,
+    build_select, escape_list_value, parse_fields, parse_filters, parse_int, parse_metric
+)
+from schema import column_types, value_columns
+
+# -------------------------------------------------------------------------
+# Data sources for visualization.py. Each one returns the rows of an API
+# data endpoint (or of one of its aggregations) as a DataFrame typed from
+# schema.py, so a chart gets the same frame whether its data comes from the
+# HTTP API, straight from PostgreSQL, or from a local snapshot file.
+#
+#   source.fetch("share_renewables", {"year": 2023})
+#   source.fetch("per_capita_energy", {"year": 2023, "n": 15}, aggregation="top")
+# -------------------------------------------------------------------------
+
+
+def _args(params):
+    """
+    Turns a params dict (values can be lists, whose items are taken whole)
+    into the MultiDict of query parameters app.py's parsers expect.
+    """
+    args = MultiDict()
+    for name, value in (params or {}).items():
+        if isinstance(value, (list, tuple)):
+            for v in value:
+                args.add(name, escape_list_value(v))
+        else:
+            args.add(name, str(value))
+    return args
+
+
+def typed_frame(df, table):
+    """
+    Casts each column of `df` to the pandas type of its schema.py type:
+    TEXT -> object (NaN when missing), FLOAT -> float64 and INT -> int64
+    (float64 when a value is missing, as read_csv would).
+    """
+    types = dict(column_types(table), id="INT", **AGGREGATE_COLUMN_TYPES)
+    columns = {}
+    for column in df.columns:
+        values = df[column]
+        if types[column] == "TEXT":
+            values = values.astype(object).where(values.notna(), np.nan)
+        elif types[column] == "INT" and values.notna().all():
+            values = values.astype("int64")
+        else:
+            values = values.astype("float64")
+        columns[column] = values.reset_index(drop=True)
+    return pd.DataFrame(columns, index=pd.RangeIndex(len(df)))
+
+
+class ApiSource:
+    """
+    Reads from app.py over HTTP, as CSV (no JSON list-of-dicts round trip).
+    """
+
+    def __init__(self, base_url="http://127.0.0.1:5000", timeout=60):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    def fetch(self, endpoint, params=None, aggregation=None):
+        url = f"{self.base_url}/api/{endpoint}" + (f"/{aggregation}" if aggregation else "")
+        query = {
+            name: [escape_list_value(v) for v in value] if isinstance(value, (list, tuple)) else value
+            for name, value in dict(params or {}, format="csv").items()
+        }
+        resp = requests.get(url, params=query, timeout=self.timeout)
+        resp.raise_for_status()
+        # Every cell is read as text and typed from the schema; only empty
+        # cells are missing values, as in ingestion.py
+        df = pd.read_csv(io.StringIO(resp.text), dtype=str, keep_default_na=False, na_values=[""])
+        return typed_frame(df, ENDPOINT_TABLES[endpoint])
+
+
+class PostgresSource:
+    """
+    Runs the API's own queries (app.build_select / app.AGGREGATIONS)
+    directly against PostgreSQL, skipping the HTTP server and the text
+    encoding. The connection is opened on first use, so the source can be
+    handed to worker processes.
+    """
+
+    def __init__(self, db_config=None):
+        self.db_config = dict(db_config or DB_CONFIG)
+        self._conn = None
+
+    def __getstate__(self):
+        return {"db_config": self.db_config, "_conn": None}
+
+    def connection(self):
+        if self._conn is None or self._conn.closed:
+            self._conn = psycopg2.connect(**self.db_config)
+            self._conn.set_session(readonly=True, autocommit=True)
+        return self._conn
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def fetch(self, endpoint, params=None, aggregation=None):
+        table = ENDPOINT_TABLES[endpoint]
+        args = _args(params)
+        if aggregation:
+            query, query_params, columns = AGGREGATIONS[aggregation](table, args)
+        else:
+            columns = parse_fields(table, args.get("fields"))
+            query, query_params = build_select(table, columns, parse_filters(args))
+        with self.connection().cursor() as cur:
+            cur.execute(query, query_params)
+            rows = cur.fetchall()
+        return typed_frame(pd.DataFrame.from_records(rows, columns=columns), table)
+
+
+class SnapshotSource:
+    """
+    Reads from a snapshot file written by save_snapshot(): every table as a
+    typed DataFrame. Filters and the `top` aggregation are applied in
+    pandas with the API's semantics; other aggregations need the API or
+    PostgreSQL. The file is a pickle, so only load snapshots you wrote.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._tables = None
+
+    def __getstate__(self):
+        return {"path": self.path, "_tables": None}
+
+    def tables(self):
+        if self._tables is None:
+            self._tables = pd.read_pickle(self.path)
+        return self._tables
+
+    def fetch(self, endpoint, params=None, aggregation=None):
+        table = ENDPOINT_TABLES[endpoint]
+        args = _args(params)
+        df = filter_frame(self.tables()[endpoint], parse_filters(args))
+        if aggregation is None:
+            return df[parse_fields(table, args.get("fields"))].reset_index(drop=True)
+        if aggregation == "top":
+            n = parse_int("n", args.get("n"), 1, MAX_TOP_N) or 10
+            metric, _ = parse_metric(table, args.get("metric"))
+            return top_frame(df, table, n, metric)
+        raise ValueError(f"/{aggregation} is not available from a snapshot; use the API or PostgreSQL source")
+
+
+def filter_frame(df, filters):
+    """
+    Applies parsed FILTERS (see app.parse_filters) to a table frame.
+    """
+    mask = pd.Series(True, index=df.index)
+    for name, value in filters.items():
+        column = {"year_from": "year", "year_to": "year"}.get(name, name)
+        if FILTERS[name][2]:
+            mask &= df[column].isin(value)
+        elif name == "year_from":
+            mask &= df[column] >= value
+        else:
+            mask &= df[column] <= value
+    return df[mask]
+
+
+def top_frame(df, table, n, metric="total"):
+    """
+    The `top` aggregation (app.top_query) of a table frame: the top `n`
+    entities of each year by `metric`, ties sharing a rank, missing values
+    ranked last.
+    """
+    values = value_columns(table)
+    ranked = df.loc[df["entity"].notna(), ["entity", "code", "year"] + values]
+    # Added left to right like the SQL expression, so totals match to the bit
+    total = ranked[values[0]].fillna(0)
+    for column in values[1:]:
+        total = total + ranked[column].fillna(0)
+    ranked = ranked.assign(total=total)
+    key = ranked[metric].fillna(-np.inf)
+    ranked["rank"] = key.groupby(ranked["year"]).rank(method="min", ascending=False).astype("int64")
+    ranked = ranked[ranked["rank"] <= n].sort_values(["year", "rank", "entity"], kind="stable")
+    return typed_frame(ranked, table)
+
+
+def save_snapshot(source, path):
+    """
+    Writes every table, read through `source`, to a snapshot file for
+    SnapshotSource.
+    """
+    tables = {endpoint: source.fetch(endpoint) for endpoint in ENDPOINT_TABLES}
+    pd.to_pickle(tables, path)
+    print(f"Snapshot of {sum(len(df) for df in tables.values())} rows saved to {path}")
+    return tables
+
+
+def make_source(kind="api", api_url=None, snapshot=None, db_config=None):
+    """
+    Builds a data source from the visualization.py options.
+    """
+    if kind == "api":
+        return ApiSource(api_url) if api_url else ApiSource()
+    if kind == "postgres":
+        return PostgresSource(db_config)
+    if kind == "snapshot":
+        if not snapshot:
+            raise ValueError("The snapshot source needs a snapshot file")
+        return SnapshotSource(snapshot)
+    raise ValueError(f"Unknown data source '{kind}'")
@@ -2,185 +2,527 @@
 
 import requests
 import psycopg2
+from psycopg2 import errors
+import pandas as pd
 import io
-import csv
+import time
+import hashlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
-# -- URLs of the CSV datasets --
-URL_GLOBAL_ENERGY_SUBSTITUTION = "https://ourworldindata.org/grapher/global-energy-substitution.csv?v=1&csvType=full&useColumnShortNames=false"
-URL_SHARE_OF_RENEWABLES        = "https://ourworldindata.org/grapher/share-electricity-renewables.csv?v=1&csvType=full&useColumnShortNames=false"
-URL_PER_CAPITA_ENERGY          = "https://ourworldindata.org/grapher/per-capita-energy-stacked.csv?v=1&csvType=full&useColumnShortNames=false"
+from profiling import RunProfile, stage
+from schema import (
+    MATERIALIZED_VIEWS, TABLE_SPECS, column_names, column_types, insert_sql, source_columns,
+    table_ddl, view_indexes, views_for
+)
 
-def download_csv(url: str) -> io.StringIO:
+# -- URLs of the CSV datasets (defined with the table specs in schema.py) --
+URL_GLOBAL_ENERGY_SUBSTITUTION = TABLE_SPECS["global_energy_substitution"]["url"]
+URL_SHARE_OF_RENEWABLES        = TABLE_SPECS["share_electricity_renewables"]["url"]
+URL_PER_CAPITA_ENERGY          = TABLE_SPECS["per_capita_energy"]["url"]
+
+# -- How rows are written to PostgreSQL --
+# "copy" streams rows through COPY ... FROM STDIN (fast bulk load).
+# "executemany" sends one INSERT per row (the original path, kept for comparison).
+LOAD_METHOD = "copy"
+LOAD_METHODS = ("copy", "executemany")
+BATCH_SIZE = 10_000           # rows written per COPY / executemany call
+# "replace" reloads a whole table; "upsert" only touches rows that changed,
+# keyed on (entity, year).
+WRITE_MODES = ("replace", "upsert")
+
+# -- HTTP settings shared by all downloads --
+HTTP_TIMEOUT = (10, 120)      # (connect, read) timeouts in seconds
+HTTP_RETRIES = 3              # retries for connection errors and 429/5xx responses
+DOWNLOAD_WORKERS = 3          # datasets fetched in parallel
+CHUNK_SIZE = 64 * 1024        # bytes read per chunk when streaming a download
+
+# -- pandas dtypes used to parse each SQL column type --
+PANDAS_DTYPES = {"TEXT": "string", "INT": "Int64", "FLOAT": "float64"}
+
+# -- Indexes built on every data table: (name suffix, definition) --
+TABLE_INDEXES = [
+    ("entity_year_key", "CREATE UNIQUE INDEX IF NOT EXISTS {index} ON {name} (entity, year)"),  # upsert key
+    ("year_entity_idx", "CREATE INDEX IF NOT EXISTS {index} ON {name} (year, entity)"),         # year filters, keyset pages
+    ("code_year_idx", "CREATE INDEX IF NOT EXISTS {index} ON {name} (code, year)"),             # code filters
+]
+
+# -- Staging swap settings --
+SWAP_LOCK_TIMEOUT = "2s"      # give up on the swap rather than queue readers behind a long query
+SWAP_ATTEMPTS = 5
+
+def create_http_session(retries: int = HTTP_RETRIES, pool_size: int = DOWNLOAD_WORKERS) -> requests.Session:
+    """
+    Creates a requests Session with a connection pool sized for the parallel
+    downloads and automatic retries with exponential backoff.
+    """
+    retry = Retry(
+        total=retries,
+        backoff_factor=0.5,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(["GET"])
+    )
+    adapter = HTTPAdapter(max_retries=retry, pool_connections=pool_size, pool_maxsize=pool_size)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+def download_csv(url: str, session: requests.Session = None, timeout=HTTP_TIMEOUT) -> io.StringIO:
     """
     Downloads a CSV file from a given URL and returns a StringIO object.
+    Uses `session` (and its connection pool) when one is given.
     """
     print(f"Downloading CSV data from {url} ...")
-    response = requests.get(url)
+    http = session or requests
+    response = http.get(url, timeout=timeout)
     response.raise_for_status()  # Raise an error if download failed
     csv_data = response.text
     return io.StringIO(csv_data)
 
-def create_tables(conn):
+def download_csv_if_changed(url: str, meta: dict = None, session: requests.Session = None,
+                            timeout=HTTP_TIMEOUT):
     """
-    Creates the tables in PostgreSQL if they don't exist.
+    Downloads a CSV file only if it changed since the last run.
+    `meta` holds the ETag, Last-Modified and content hash stored for the source.
+    Returns (StringIO or None, new metadata); None means nothing changed.
     """
-    create_global_energy_table = """
-    CREATE TABLE IF NOT EXISTS global_energy_substitution (
-        id SERIAL PRIMARY KEY,
-        entity TEXT,
-        code TEXT,
-        year INT,
-        other_renewables FLOAT,
-        biofuels FLOAT,
-        solar FLOAT,
-        wind FLOAT,
-        hydropower FLOAT,
-        nuclear FLOAT,
-        gas FLOAT,
-        oil FLOAT,
-        coal FLOAT,
-        traditional_biomass FLOAT
-    );
+    meta = meta or {}
+    headers = {}
+    if meta.get("etag"):
+        headers["If-None-Match"] = meta["etag"]
+    if meta.get("last_modified"):
+        headers["If-Modified-Since"] = meta["last_modified"]
+
+    print(f"Checking CSV data at {url} ...")
+    http = session or requests
+    response = http.get(url, timeout=timeout, headers=headers)
+    if response.status_code == 304:
+        return None, meta
+    response.raise_for_status()  # Raise an error if download failed
+
+    new_meta = {
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+        "content_hash": hashlib.sha256(response.content).hexdigest(),
+    }
+    if new_meta["content_hash"] == meta.get("content_hash"):
+        return None, new_meta
+    return io.StringIO(response.text), new_meta
+
+def stream_csv(url: str, session: requests.Session = None, timeout=HTTP_TIMEOUT,
+               chunk_size: int = CHUNK_SIZE):
     """
+    Streams a CSV file from a given URL and yields it line by line.
+    The body is read in chunks of `chunk_size` bytes, so memory use does not
+    grow with the size of the file.
+    """
+    print(f"Streaming CSV data from {url} ...")
+    http = session or requests
+    with http.get(url, timeout=timeout, stream=True) as response:
+        response.raise_for_status()  # Raise an error if download failed
+        response.encoding = response.encoding or "utf-8"
+        pending = ""
+        for chunk in response.iter_content(chunk_size=chunk_size, decode_unicode=True):
+            # The last piece of each chunk may be a partial line; carry it over
+            *lines, pending = (pending + chunk).split("\n")
+            for line in lines:
+                yield line + "\n"
+        if pending:
+            yield pending
+
+class _LineReader(io.TextIOBase):
+    """
+    Read-only text stream over an iterable of strings, so pandas can parse
+    the lines yielded by stream_csv() incrementally.
+    """
+    def __init__(self, pieces):
+        self._pieces = iter(pieces)
+        self._pending = ""
+
+    def readable(self):
+        return True
 
-    create_share_renewables_table = """
-    CREATE TABLE IF NOT EXISTS share_electricity_renewables (
-        id SERIAL PRIMARY KEY,
-        entity TEXT,
-        code TEXT,
-        year INT,
-        renewables_pct_electricity FLOAT
+    def read(self, size=-1):
+        parts, length = [self._pending], len(self._pending)
+        while size is None or size < 0 or length < size:
+            piece = next(self._pieces, None)
+            if piece is None:
+                break
+            parts.append(piece)
+            length += len(piece)
+        data = "".join(parts)
+        if size is None or size < 0:
+            size = len(data)
+        self._pending = data[size:]
+        return data[:size]
+
+def parse_csv(table: str, csv_file, batch_size: int = None):
+    """
+    Parses a dataset's CSV into DataFrames of at most `batch_size` rows.
+    Columns are selected, typed and renamed according to the table's spec in
+    schema.py and converted a whole column at a time by pandas' C parser.
+    Only empty cells become NULL (so codes like "NA" survive).
+    `csv_file` can be a StringIO or any iterable of CSV lines (see stream_csv).
+    """
+    sources = source_columns(table)
+    types = column_types(table)
+    dtypes = {source: PANDAS_DTYPES[types[target]] for source, target in sources.items()}
+    if not hasattr(csv_file, "read"):
+        csv_file = _LineReader(csv_file)
+
+    reader = pd.read_csv(
+        csv_file,
+        usecols=list(sources),
+        dtype=dtypes,
+        keep_default_na=False,
+        na_values=[""],
+        chunksize=batch_size or BATCH_SIZE,
+    )
+    for frame in reader:
+        yield frame.rename(columns=sources)[column_names(table)]
+
+def _write_batch(cur, table: str, target: str, batch: pd.DataFrame, method: str):
+    """
+    Writes one batch of parsed rows of `table` into `target` (the staging or
+    temporary table) with the given load method.
+    """
+    if method == "copy":
+        column_list = ", ".join(column_names(table))
+        # Missing values are written as unquoted empty fields, which COPY reads as NULL
+        buffer = io.StringIO()
+        batch.to_csv(buffer, header=False, index=False)
+        buffer.seek(0)
+        cur.copy_expert(
+            f"COPY {target} ({column_list}) FROM STDIN WITH (FORMAT csv)",
+            buffer
+        )
+    else:
+        rows = batch.astype(object).where(batch.notna(), None).itertuples(index=False, name=None)
+        cur.executemany(insert_sql(table, target), rows)
+
+def _upsert_from_staging(cur, table: str, staging: str, columns: list):
+    """
+    Merges `staging` into `table` keyed on (entity, year): new rows are inserted,
+    rows whose values differ are updated and rows missing from `staging` are
+    deleted. Unchanged rows are left alone. Returns (upserted, deleted) counts.
+    """
+    column_list = ", ".join(columns)
+    value_columns = [c for c in columns if c not in ("entity", "year")]
+    updates = ", ".join(f"{c} = EXCLUDED.{c}" for c in value_columns)
+    current = ", ".join(f"{table}.{c}" for c in value_columns)
+    incoming = ", ".join(f"EXCLUDED.{c}" for c in value_columns)
+
+    cur.execute(f"""
+        INSERT INTO {table} ({column_list})
+        SELECT DISTINCT ON (entity, year) {column_list} FROM {staging}
+        ON CONFLICT (entity, year) DO UPDATE SET {updates}
+        WHERE ({current}) IS DISTINCT FROM ({incoming})
+    """)
+    upserted = cur.rowcount
+    cur.execute(f"""
+        DELETE FROM {table} t
+        WHERE NOT EXISTS (
+            SELECT 1 FROM {staging} s
+            WHERE s.entity IS NOT DISTINCT FROM t.entity
+              AND s.year IS NOT DISTINCT FROM t.year
+        )
+    """)
+    return upserted, cur.rowcount
+
+def create_indexes(cur, name: str):
+    """
+    Creates the TABLE_INDEXES on the live or staging table `name`.
+    Index names are prefixed with the table name.
+    """
+    for suffix, definition in TABLE_INDEXES:
+        index = f"{name}_{suffix}"
+        cur.execute(definition.format(index=index, name=name))
+
+def bump_data_version(cur):
+    """
+    Marks the published data as changed. Called inside the transaction that
+    changes it, so readers never see new data under an old version.
+    """
+    cur.execute("UPDATE data_version SET version = version + 1, updated_at = now() WHERE id = 1;")
+
+def create_views(cur, table: str, staging: str = None):
+    """
+    Creates the materialized views built from `table` (see schema.py),
+    along with their indexes, if they don't exist. With `staging`, builds
+    fresh `<view>_staging` copies from the staging table instead, for
+    swap_in_staging() to rename.
+    """
+    suffix = "_staging" if staging else ""
+    for view in views_for(table):
+        name = view + suffix
+        query = MATERIALIZED_VIEWS[view]["query"].format(source=staging or table)
+        if staging:
+            cur.execute(f"DROP MATERIALIZED VIEW IF EXISTS {name};")
+        cur.execute(f"CREATE MATERIALIZED VIEW IF NOT EXISTS {name} AS {query};")
+        for index_suffix, columns, unique in view_indexes(view):
+            cur.execute(
+                f"CREATE {'UNIQUE ' if unique else ''}INDEX IF NOT EXISTS {name}_{index_suffix} "
+                f"ON {name} ({', '.join(columns)});"
+            )
+
+def refresh_views(cur, table: str):
+    """
+    Refreshes the materialized views built from `table` without blocking readers.
+    """
+    for view in views_for(table):
+        cur.execute(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {view};")
+
+def swap_in_staging(conn, table: str):
+    """
+    Replaces `table` with `{table}_staging` in one short transaction.
+    Readers keep using the old table until the commit and the new one after it,
+    so they never see an empty or half-loaded table. The lock timeout stops a
+    long-running reader from queueing every other request behind the swap;
+    the swap is retried instead. Materialized views of the old table are
+    dropped with it; their replacements were built from the staging table
+    beforehand (see create_views) and are only renamed here, so readers
+    never wait on a view rebuild.
+    """
+    staging = f"{table}_staging"
+    index_suffixes = ["pkey"] + [suffix for suffix, _ in TABLE_INDEXES]
+    for attempt in range(1, SWAP_ATTEMPTS + 1):
+        try:
+            with conn.cursor() as cur:
+                cur.execute(f"SET LOCAL lock_timeout = '{SWAP_LOCK_TIMEOUT}';")
+                cur.execute(f"DROP TABLE IF EXISTS {table}_old CASCADE;")
+                cur.execute(f"ALTER TABLE {table} RENAME TO {table}_old;")
+                cur.execute(f"ALTER TABLE {staging} RENAME TO {table};")
+                cur.execute(f"DROP TABLE {table}_old CASCADE;")
+                for suffix in index_suffixes:
+                    cur.execute(f"ALTER INDEX {staging}_{suffix} RENAME TO {table}_{suffix};")
+                for view in views_for(table):
+                    cur.execute(f"ALTER MATERIALIZED VIEW {view}_staging RENAME TO {view};")
+                    for suffix, _, _ in view_indexes(view):
+                        cur.execute(f"ALTER INDEX {view}_staging_{suffix} RENAME TO {view}_{suffix};")
+                bump_data_version(cur)
+            conn.commit()
+            return
+        except errors.LockNotAvailable:
+            conn.rollback()
+            print(f"Swap of {table} timed out waiting for readers (attempt {attempt}/{SWAP_ATTEMPTS}).")
+            time.sleep(attempt)
+    raise RuntimeError(f"Could not swap {staging} into {table} after {SWAP_ATTEMPTS} attempts.")
+
+def write_rows(conn, table: str, batches, method: str = None, mode: str = "replace",
+               profile=None):
+    """
+    Writes parsed `batches` (DataFrames, see parse_csv) to `table` using the
+    given load method and reports the throughput in rows per second.
+    `batches` may be a generator, so only one batch is held in memory.
+
+    In "replace" mode the rows are loaded into a fresh staging table, which is
+    indexed and then swapped in for the live table (see swap_in_staging).
+    In "upsert" mode the rows are loaded into a temporary table and merged,
+    so only changed rows are written.
+    `profile` (a profiling.DatasetProfile) records the time of each stage.
+    """
+    method = method or LOAD_METHOD
+    if method not in LOAD_METHODS:
+        raise ValueError(f"Unknown load method {method!r}; expected one of {LOAD_METHODS}")
+    if mode not in WRITE_MODES:
+        raise ValueError(f"Unknown write mode {mode!r}; expected one of {WRITE_MODES}")
+
+    columns = column_names(table)
+    total = 0
+    start = time.perf_counter()
+    with conn.cursor() as cur:
+        if mode == "upsert":
+            target = f"{table}_incoming"
+            cur.execute(f"""
+                CREATE TEMP TABLE {target} ON COMMIT DROP AS
+                SELECT {", ".join(columns)} FROM {table} WITH NO DATA
+            """)
+        else:
+            # The live table keeps serving reads while the staging copy loads
+            target = f"{table}_staging"
+            cur.execute(f"DROP TABLE IF EXISTS {target} CASCADE;")  # and views left by a failed run
+            cur.execute(table_ddl(table, target))
+        for batch in batches:
+            with stage(profile, "write"):
+                _write_batch(cur, table, target, batch, method)
+            total += len(batch)
+            if profile is not None:
+                profile.add("write", rows=len(batch))
+        if mode == "upsert":
+            with stage(profile, "merge"):
+                upserted, deleted = _upsert_from_staging(cur, table, target, columns)
+                print(f"Merged {table}: {upserted} rows inserted or updated, {deleted} deleted.")
+                if upserted or deleted:
+                    refresh_views(cur, table)
+                    bump_data_version(cur)
+        else:
+            # Indexes and views are cheaper to build once the data is in
+            # place, and are built before the swap so it stays short
+            with stage(profile, "index"):
+                create_indexes(cur, target)
+                create_views(cur, table, staging=target)
+        with stage(profile, "commit"):
+            conn.commit()
+    if mode == "replace":
+        with stage(profile, "swap"):
+            swap_in_staging(conn, table)
+    elapsed = time.perf_counter() - start
+    rate = total / elapsed if elapsed > 0 else float("inf")
+    print(f"Wrote {total} rows to {target} via {method} in {elapsed:.2f}s ({rate:,.0f} rows/s).")
+
+def create_tables(conn):
+    """
+    Creates the tables in PostgreSQL if they don't exist.
+    """
+    create_metadata_table = """
+    CREATE TABLE IF NOT EXISTS ingestion_metadata (
+        source TEXT PRIMARY KEY,
+        etag TEXT,
+        last_modified TEXT,
+        content_hash TEXT,
+        checked_at TIMESTAMPTZ DEFAULT now()
     );
     """
 
-    create_per_capita_energy_table = """
-    CREATE TABLE IF NOT EXISTS per_capita_energy (
-        id SERIAL PRIMARY KEY,
-        entity TEXT,
-        code TEXT,
-        year INT,
-        coal_per_capita FLOAT,
-        oil_per_capita FLOAT,
-        gas_per_capita FLOAT,
-        nuclear_per_capita FLOAT,
-        hydro_per_capita FLOAT,
-        wind_per_capita FLOAT,
-        solar_per_capita FLOAT,
-        other_renewables_per_capita FLOAT
+    # Single-row stamp bumped whenever published data changes; the API uses it
+    # to invalidate its response cache and ETags
+    create_version_table = """
+    CREATE TABLE IF NOT EXISTS data_version (
+        id INT PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+        version BIGINT NOT NULL DEFAULT 0,
+        updated_at TIMESTAMPTZ DEFAULT now()
     );
+    INSERT INTO data_version (id) VALUES (1) ON CONFLICT (id) DO NOTHING;
     """
 
     with conn.cursor() as cur:
-        cur.execute(create_global_energy_table)
-        cur.execute(create_share_renewables_table)
-        cur.execute(create_per_capita_energy_table)
+        for table in TABLE_SPECS:
+            cur.execute(table_ddl(table))
+            create_indexes(cur, table)
+            create_views(cur, table)
+        cur.execute(create_metadata_table)
+        cur.execute(create_version_table)
         conn.commit()
     print("Tables created or already exist.")
 
-def insert_global_energy_substitution(conn, csv_file: io.StringIO):
-    """
-    Inserts data into the global_energy_substitution table.
-    """
-    reader = csv.DictReader(csv_file)
-    rows = []
-    for row in reader:
-        # Convert empty strings to None
-        rows.append((
-            row['Entity'] or None,
-            row['Code'] or None,
-            int(row['Year']) if row['Year'] else None,
-            float(row['Other renewables (TWh, substituted energy)']) if row['Other renewables (TWh, substituted energy)'] else None,
-            float(row['Biofuels (TWh, substituted energy)']) if row['Biofuels (TWh, substituted energy)'] else None,
-            float(row['Solar (TWh, substituted energy)']) if row['Solar (TWh, substituted energy)'] else None,
-            float(row['Wind (TWh, substituted energy)']) if row['Wind (TWh, substituted energy)'] else None,
-            float(row['Hydropower (TWh, substituted energy)']) if row['Hydropower (TWh, substituted energy)'] else None,
-            float(row['Nuclear (TWh, substituted energy)']) if row['Nuclear (TWh, substituted energy)'] else None,
-            float(row['Gas (TWh, substituted energy)']) if row['Gas (TWh, substituted energy)'] else None,
-            float(row['Oil (TWh, substituted energy)']) if row['Oil (TWh, substituted energy)'] else None,
-            float(row['Coal (TWh, substituted energy)']) if row['Coal (TWh, substituted energy)'] else None,
-            float(row['Traditional biomass (TWh, substituted energy)']) if row['Traditional biomass (TWh, substituted energy)'] else None,
-        ))
-
-    insert_query = """
-    INSERT INTO global_energy_substitution (
-        entity, code, year, 
-        other_renewables, biofuels, solar, wind, hydropower, 
-        nuclear, gas, oil, coal, traditional_biomass
-    )
-    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+def load_source_metadata(conn) -> dict:
+    """
+    Returns the stored ETag, Last-Modified and content hash of every source,
+    keyed by source name.
     """
+    with conn.cursor() as cur:
+        cur.execute("SELECT source, etag, last_modified, content_hash FROM ingestion_metadata;")
+        return {
+            source: {"etag": etag, "last_modified": last_modified, "content_hash": content_hash}
+            for source, etag, last_modified, content_hash in cur.fetchall()
+        }
 
+def save_source_metadata(conn, source: str, meta: dict):
+    """
+    Records the ETag, Last-Modified and content hash seen for a source.
+    """
     with conn.cursor() as cur:
-        cur.execute("TRUNCATE TABLE global_energy_substitution;")  # Clear old data
-        cur.executemany(insert_query, rows)
+        cur.execute("""
+            INSERT INTO ingestion_metadata (source, etag, last_modified, content_hash, checked_at)
+            VALUES (%s, %s, %s, %s, now())
+            ON CONFLICT (source) DO UPDATE SET
+                etag = EXCLUDED.etag,
+                last_modified = EXCLUDED.last_modified,
+                content_hash = EXCLUDED.content_hash,
+                checked_at = EXCLUDED.checked_at
+        """, (source, meta.get("etag"), meta.get("last_modified"), meta.get("content_hash")))
         conn.commit()
-    print("Inserted data into global_energy_substitution table.")
 
-def insert_share_renewables(conn, csv_file: io.StringIO):
+def load_table(conn, table: str, csv_file, method: str = None, batch_size: int = None,
+               mode: str = "replace", profile=None):
     """
-    Inserts data into the share_electricity_renewables table.
+    Parses a dataset's CSV and writes it to its table.
+    `csv_file` can be a StringIO or any iterable of CSV lines (see stream_csv).
+    With a `profile`, parsing is timed batch by batch as the "parse" stage.
     """
-    reader = csv.DictReader(csv_file)
-    rows = []
-    for row in reader:
-        rows.append((
-            row['Entity'] or None,
-            row['Code'] or None,
-            int(row['Year']) if row['Year'] else None,
-            float(row['Renewables - % electricity']) if row['Renewables - % electricity'] else None
-        ))
+    batches = parse_csv(table, csv_file, batch_size)
+    if profile is not None:
+        batches = profile.iterate("parse", batches, lambda batch: {"rows": len(batch)})
+    write_rows(conn, table, batches, method, mode, profile)
+    print(f"Inserted data into {table} table.")
 
-    insert_query = """
-    INSERT INTO share_electricity_renewables (
-        entity, code, year, renewables_pct_electricity
-    )
-    VALUES (%s, %s, %s, %s)
+# -- Datasets loaded by main(), keyed by table name --
+DATASETS = {table: {"url": spec["url"]} for table, spec in TABLE_SPECS.items()}
+
+def download_and_load(conn, datasets: dict, method: str = None,
+                      session: requests.Session = None, workers: int = DOWNLOAD_WORKERS,
+                      stream: bool = False, batch_size: int = None, incremental: bool = False,
+                      profile: RunProfile = None):
     """
+    Downloads all datasets concurrently on a thread pool and loads each one
+    as soon as its own download finishes. Loading stays on the calling thread
+    because the connection is shared.
 
-    with conn.cursor() as cur:
-        cur.execute("TRUNCATE TABLE share_electricity_renewables;")
-        cur.executemany(insert_query, rows)
-        conn.commit()
-    print("Inserted data into share_electricity_renewables table.")
-
-def insert_per_capita_energy(conn, csv_file: io.StringIO):
-    """
-    Inserts data into the per_capita_energy table.
-    """
-    reader = csv.DictReader(csv_file)
-    rows = []
-    for row in reader:
-        rows.append((
-            row['Entity'] or None,
-            row['Code'] or None,
-            int(row['Year']) if row['Year'] else None,
-            float(row['Coal per capita (kWh)']) if row['Coal per capita (kWh)'] else None,
-            float(row['Oil per capita (kWh)']) if row['Oil per capita (kWh)'] else None,
-            float(row['Gas per capita (kWh)']) if row['Gas per capita (kWh)'] else None,
-            float(row['Nuclear per capita (kWh - equivalent)']) if row['Nuclear per capita (kWh - equivalent)'] else None,
-            float(row['Hydro per capita (kWh - equivalent)']) if row['Hydro per capita (kWh - equivalent)'] else None,
-            float(row['Wind per capita (kWh - equivalent)']) if row['Wind per capita (kWh - equivalent)'] else None,
-            float(row['Solar per capita (kWh - equivalent)']) if row['Solar per capita (kWh - equivalent)'] else None,
-            float(row['Other renewables per capita (kWh - equivalent)']) if row['Other renewables per capita (kWh - equivalent)'] else None
-        ))
-
-    insert_query = """
-    INSERT INTO per_capita_energy (
-        entity, code, year,
-        coal_per_capita, oil_per_capita, gas_per_capita,
-        nuclear_per_capita, hydro_per_capita, wind_per_capita,
-        solar_per_capita, other_renewables_per_capita
-    )
-    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+    With `stream=True` each dataset is instead piped straight from the HTTP
+    response through the CSV parser into batched writes, one dataset at a time,
+    so peak memory stays flat regardless of file size.
+
+    With `incremental=True` conditional requests and the stored content hash
+    are used to skip unchanged datasets, and changed ones are upserted.
+
+    With a `profile` (profiling.RunProfile), the download, parse, write,
+    index, commit and swap (or merge) stages of each dataset are timed and
+    counted.
     """
+    if stream and incremental:
+        raise ValueError("Incremental loads need the full download to hash it; they cannot be streamed.")
 
-    with conn.cursor() as cur:
-        cur.execute("TRUNCATE TABLE per_capita_energy;")
-        cur.executemany(insert_query, rows)
-        conn.commit()
-    print("Inserted data into per_capita_energy table.")
+    own_session = session is None
+    session = session or create_http_session(pool_size=workers)
+    start = time.perf_counter()
+    try:
+        if stream:
+            for name, info in datasets.items():
+                lines = stream_csv(info["url"], session)
+                dataset_profile = profile.dataset(name) if profile else None
+                if dataset_profile is not None:
+                    lines = dataset_profile.iterate("download", lines, lambda line: {"bytes": len(line.encode("utf-8"))})
+                load_table(conn, name, lines, method, batch_size, profile=dataset_profile)
+        else:
+            known = load_source_metadata(conn) if incremental else {}
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                futures = {}
+                for name, info in datasets.items():
+                    if incremental:
+                        download, args = download_csv_if_changed, (info["url"], known.get(name), session)
+                    else:
+                        download, args = download_csv, (info["url"], session)
+                    if profile:
+                        future = pool.submit(profile.dataset(name).call, "download", download, *args)
+                    else:
+                        future = pool.submit(download, *args)
+                    futures[future] = name
+                for future in as_completed(futures):
+                    name = futures[future]
+                    dataset_profile = profile.dataset(name) if profile else None
+                    if incremental:
+                        csv_file, meta = future.result()
+                    else:
+                        csv_file, meta = future.result(), None
+                    if dataset_profile is not None and csv_file is not None:
+                        dataset_profile.add("download", bytes=len(csv_file.getvalue().encode("utf-8")))
+                    if csv_file is None:
+                        print(f"{name} has not changed; skipping.")
+                    else:
+                        print(f"Downloaded {name} after {time.perf_counter() - start:.2f}s.")
+                        mode = "upsert" if incremental else "replace"
+                        load_table(conn, name, csv_file, method, batch_size, mode, dataset_profile)
+                    if incremental:
+                        save_source_metadata(conn, name, meta)
+    finally:
+        if own_session:
+            session.close()
+    print(f"Processed {len(datasets)} datasets in {time.perf_counter() - start:.2f}s.")
 
-def main():
+def main(method: str = None, datasets: dict = None, stream: bool = False, batch_size: int = None,
+         incremental: bool = False, report: str = None, profile_dir: str = None):
     # Database connection parameters
     db_host = "localhost"
     db_name = "energy"
@@ -201,18 +543,64 @@ def main():
         # Create tables if not exist
         create_tables(conn)
 
-        # Download CSV data
-        csv_global_energy = download_csv(URL_GLOBAL_ENERGY_SUBSTITUTION)
-        csv_share_renewables = download_csv(URL_SHARE_OF_RENEWABLES)
-        csv_per_capita = download_csv(URL_PER_CAPITA_ENERGY)
+        # Per-stage timings (and cProfile dumps) of this run, if asked for
+        profile = None
+        if report or profile_dir:
+            options = {
+                "method": method or LOAD_METHOD, "stream": stream,
+                "batch_size": batch_size or BATCH_SIZE, "incremental": incremental,
+            }
+            # Without --stream, downloads run on threads next to parsing and
+            # writing, so per-stage memory peaks can't be told apart
+            profile = RunProfile(options, trace_memory=bool(report), profile_dir=profile_dir,
+                                 stage_peaks=stream)
+
+        # Download CSV data and insert each dataset as it arrives
+        download_and_load(
+            conn, datasets or DATASETS, method,
+            stream=stream, batch_size=batch_size, incremental=incremental, profile=profile
+        )
 
-        # Insert data
-        insert_global_energy_substitution(conn, csv_global_energy)
-        insert_share_renewables(conn, csv_share_renewables)
-        insert_per_capita_energy(conn, csv_per_capita)
+        if report:
+            profile.save(report)
+        elif profile is not None:
+            profile.finish()
 
     finally:
         conn.close()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Download OWID energy datasets into PostgreSQL.")
+    parser.add_argument(
+        "--method", choices=LOAD_METHODS, default=LOAD_METHOD,
+        help="How rows are written: bulk COPY (default) or one INSERT per row."
+    )
+    load_mode = parser.add_mutually_exclusive_group()
+    load_mode.add_argument(
+        "--stream", action="store_true",
+        help="Stream each download through the parser into the database with bounded memory."
+    )
+    load_mode.add_argument(
+        "--incremental", action="store_true",
+        help="Skip datasets that have not changed and upsert only the rows that differ."
+    )
+    parser.add_argument(
+        "--batch-size", type=int, default=BATCH_SIZE,
+        help=f"Rows written per database round trip (default {BATCH_SIZE})."
+    )
+    parser.add_argument(
+        "--report", metavar="PATH",
+        help="Write a JSON report of per-stage timings, row/byte counts and peak memory to PATH."
+    )
+    parser.add_argument(
+        "--profile-dir", metavar="DIR",
+        help="Dump a cProfile file per dataset and stage into DIR (open with pstats or snakeviz)."
+    )
+    args = parser.parse_args()
+    main(
+        method=args.method, stream=args.stream,
+        batch_size=args.batch_size, incremental=args.incremental,
+        report=args.report, profile_dir=args.profile_dir
+    )
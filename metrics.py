@@ -0,0 +1,135 @@
+# metrics.py
+
+import contextlib
+import threading
+import time
+
+# -------------------------------------------------------------------------
+# Minimal Prometheus-style metrics for app.py: histograms and gauges,
+# rendered in the Prometheus text exposition format (version 0.0.4).
+# -------------------------------------------------------------------------
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+ROW_BUCKETS = (1, 10, 100, 1000, 10000, 100000, 1000000)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """
+    A histogram with a fixed set of labels, e.g.
+    Histogram("api_request_seconds", "...", ["route"]).observe(0.2, route="/api/x")
+    """
+
+    def __init__(self, name, help_text, labelnames, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = list(labelnames)
+        self.buckets = tuple(buckets) + (float("inf"),)
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {key: list(values) for key, values in sorted(self._series.items())}
+        for key, values in series.items():
+            for bound, count in zip(self.buckets, values):
+                labels = _labels(self.labelnames, key, ("le", _number(bound)))
+                lines.append(f"{self.name}_bucket{labels} {count}")
+            labels = _labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_number(values[-2])}")
+            lines.append(f"{self.name}_count{labels} {values[-1]}")
+        return lines
+
+
+class Gauge:
+    """
+    A gauge whose samples are read when the metrics are rendered.
+    `collect` returns a list of (label values dict, value).
+    """
+
+    def __init__(self, name, help_text, collect):
+        self.name = name
+        self.help_text = help_text
+        self.collect = collect
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} gauge"]
+        for labels, value in self.collect():
+            lines.append(f"{self.name}{_labels(list(labels), list(labels.values()))} {_number(value)}")
+        return lines
+
+
+class Registry:
+    """
+    The metrics served together on one endpoint.
+    """
+
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+class RequestTimer:
+    """
+    Collects the time one request spends in each phase (connect, query,
+    fetch, serialize, ...) and the queries it ran.
+    """
+
+    def __init__(self, route, method, path=None):
+        self.route = route      # URL rule, e.g. /api/<endpoint>/<aggregation>
+        self.method = method
+        self.path = path or route
+        self.started = time.perf_counter()
+        self.phases = {}    # phase -> seconds
+        self.queries = []   # (sql, params, rows, seconds)
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - started
+
+    def add_query(self, sql, params, rows, seconds):
+        self.queries.append((sql, params, rows, seconds))
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
@@ -0,0 +1,211 @@
+# profiling.py
+
+import contextlib
+import cProfile
+import json
+import os
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+# -------------------------------------------------------------------------
+# Per-stage profiling of ingestion runs (see ingestion.py --report).
+#
+# Stages of one dataset can interleave: when streaming, each parsed batch
+# pulls lines from the download, and each written batch pulls a parsed one.
+# Stages therefore nest, and a stage's time and memory are counted only
+# while it is the innermost one, so download, parse and write add up to
+# the dataset's total instead of overlapping.
+#
+# tracemalloc keeps a single peak for the whole process, and a stage resets
+# it when it starts. Per-stage peaks are therefore only meaningful while one
+# thread runs stages at a time; when downloads run on threads alongside
+# parsing and writing, the stages would reset each other's peaks, so only
+# the run's peak is reported (see RunProfile's `stage_peaks`).
+# -------------------------------------------------------------------------
+
+
+class DatasetProfile:
+    """
+    Timings, counters and (with `stage_peaks`) peak traced memory of each
+    stage of one dataset. Stages of a dataset run on one thread at a time.
+    `run_peak` collects the process peak before each reset.
+    """
+
+    def __init__(self, name, trace_memory=False, profile_dir=None, stage_peaks=True, run_peak=None):
+        self.name = name
+        self.trace_memory = trace_memory
+        self.stage_peaks = trace_memory and stage_peaks
+        self.run_peak = run_peak if run_peak is not None else {"bytes": 0}
+        self.profile_dir = profile_dir
+        self.stages = {}        # stage -> {"seconds", "calls", counters..., "peak_memory_bytes"}
+        self._profilers = {}    # stage -> cProfile.Profile (with profile_dir)
+        self._stack = []        # [stage, segment start] of the running stages, innermost last
+
+    def _stats(self, stage):
+        return self.stages.setdefault(stage, {"seconds": 0.0, "calls": 0})
+
+    def _pause(self):
+        if not self._stack:
+            return
+        stage, started = self._stack[-1]
+        stats = self._stats(stage)
+        stats["seconds"] += time.perf_counter() - started
+        if self.stage_peaks:
+            peak = tracemalloc.get_traced_memory()[1]
+            stats["peak_memory_bytes"] = max(stats.get("peak_memory_bytes", 0), peak)
+        profiler = self._profilers.get(stage)
+        if profiler is not None:
+            profiler.disable()
+
+    def _resume(self):
+        if not self._stack:
+            return
+        stage = self._stack[-1][0]
+        if self.stage_peaks:
+            self.run_peak["bytes"] = max(self.run_peak["bytes"], tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+        if self.profile_dir:
+            profiler = self._profilers.setdefault(stage, cProfile.Profile())
+            try:
+                profiler.enable()
+            except ValueError:
+                pass  # another thread's profiler is active (Python 3.12+); skip this segment
+        self._stack[-1][1] = time.perf_counter()
+
+    @contextlib.contextmanager
+    def stage(self, stage):
+        """
+        Times the block as `stage`, pausing the enclosing stage meanwhile.
+        """
+        self._pause()
+        self._stack.append([stage, None])
+        self._stats(stage)["calls"] += 1
+        self._resume()
+        try:
+            yield
+        finally:
+            self._pause()
+            self._stack.pop()
+            self._resume()
+
+    def add(self, stage, **counters):
+        """
+        Adds to the counters of `stage`, e.g. add("parse", rows=10000).
+        """
+        stats = self._stats(stage)
+        for name, value in counters.items():
+            stats[name] = stats.get(name, 0) + value
+
+    def iterate(self, stage, iterable, count=None):
+        """
+        Yields from `iterable`, timing each step as `stage`. `count(item)`
+        returns the counters to add for each item.
+        """
+        iterator = iter(iterable)
+        while True:
+            with self.stage(stage):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+                if count is not None:
+                    self.add(stage, **count(item))
+            yield item
+
+    def call(self, stage, function, *args, **kwargs):
+        """
+        Calls `function` as `stage` (e.g. on a download thread).
+        """
+        with self.stage(stage):
+            return function(*args, **kwargs)
+
+    def dump_profiles(self):
+        """
+        Writes one cProfile file per stage into `profile_dir`; returns their paths.
+        """
+        paths = {}
+        for stage, profiler in self._profilers.items():
+            path = os.path.join(self.profile_dir, f"{self.name}.{stage}.prof")
+            profiler.dump_stats(path)
+            paths[stage] = path
+        return paths
+
+    def to_dict(self):
+        stages = {
+            stage: {k: round(v, 4) if isinstance(v, float) else v for k, v in stats.items()}
+            for stage, stats in self.stages.items()
+        }
+        return {"seconds": round(sum(s["seconds"] for s in self.stages.values()), 4), "stages": stages}
+
+
+class RunProfile:
+    """
+    The profile of one ingestion run: a DatasetProfile per dataset plus the
+    run's options, written out as a JSON report. Turn `stage_peaks` off
+    when stages run on several threads at once; the report then has only
+    the run's peak memory.
+    """
+
+    def __init__(self, options=None, trace_memory=True, profile_dir=None, stage_peaks=True):
+        self.options = options or {}
+        self.trace_memory = trace_memory
+        self.stage_peaks = stage_peaks
+        self.profile_dir = profile_dir
+        self._peak = {"bytes": 0}  # largest process peak seen before a stage reset it
+        self.datasets = {}
+        self.started_at = datetime.now(timezone.utc)
+        self._start = time.perf_counter()
+        self._started_tracing = False
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        if profile_dir:
+            os.makedirs(profile_dir, exist_ok=True)
+
+    def dataset(self, name):
+        if name not in self.datasets:
+            self.datasets[name] = DatasetProfile(
+                name, self.trace_memory, self.profile_dir, self.stage_peaks, self._peak
+            )
+        return self.datasets[name]
+
+    def finish(self):
+        """
+        Stops memory tracing and returns the report dict.
+        """
+        report = {
+            "started_at": self.started_at.isoformat(timespec="seconds"),
+            "seconds": round(time.perf_counter() - self._start, 4),
+            "options": self.options,
+            "datasets": {name: profile.to_dict() for name, profile in self.datasets.items()},
+        }
+        if self.trace_memory:
+            # Every stage reset recorded the peak it discarded
+            report["peak_memory_bytes"] = max(self._peak["bytes"], tracemalloc.get_traced_memory()[1])
+        if self.profile_dir:
+            for name, profile in self.datasets.items():
+                report["datasets"][name]["profiles"] = profile.dump_profiles()
+        if self._started_tracing:
+            tracemalloc.stop()
+        return report
+
+    def save(self, path):
+        """
+        Finishes the run and writes its report to `path` as JSON.
+        """
+        report = self.finish()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Ingestion report saved to {path}")
+        return report
+
+
+def stage(profile, name):
+    """
+    `profile.stage(name)`, or a no-op when `profile` is None.
+    """
+    return profile.stage(name) if profile is not None else contextlib.nullcontext()
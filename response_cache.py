@@ -0,0 +1,197 @@
+# response_cache.py
+
+import gzip
+import hashlib
+import threading
+import zlib
+from collections import OrderedDict
+
+try:
+    import brotli
+except ImportError:  # optional: without it only gzip is offered
+    brotli = None
+
+# Compression settings. Cached payloads are compressed once, but on the
+# request path of the first (cache-miss) request: brotli 11 or gzip 9 take
+# seconds per MB of JSON there for only slightly smaller output, so the
+# defaults stay at the fast levels also used while streaming.
+COMPRESSION = {
+    'min_size': 1024,           # smaller bodies are sent as they are
+    'gzip_level': 6,
+    'brotli_quality': 5,
+    'stream_gzip_level': 6,
+    'stream_brotli_quality': 5,
+}
+
+
+class ResponseCache:
+    """
+    In-process LRU cache of serialized API responses.
+
+    Entries are evicted least-recently-used first once either `max_entries`
+    or `max_bytes` (total size of the bodies and their compressed copies)
+    is exceeded. The whole cache is dropped when the data version changes
+    (see set_version).
+    """
+
+    def __init__(self, max_entries=256, max_bytes=64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.version = None
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0}
+
+    def set_version(self, version):
+        """
+        Records the current data version, clearing the cache if it changed.
+        """
+        with self._lock:
+            if version != self.version:
+                if self.version is not None:
+                    self.stats['invalidations'] += 1
+                self.version = version
+                self._entries.clear()
+                self._size = 0
+
+    def get(self, key):
+        """
+        Returns the cached entry for `key` (a dict) or None.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats['hits'] += 1
+            return entry
+
+    def put(self, key, body, mimetype, version, headers=None):
+        """
+        Stores a serialized response body and the headers that go with it.
+        Bodies produced for an older data version, or larger than the whole
+        cache, are not stored.
+        """
+        size = len(body)
+        with self._lock:
+            if version != self.version or size > self.max_bytes:
+                return
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= old['size']
+            self._entries[key] = {
+                'body': body, 'mimetype': mimetype, 'headers': headers or {}, 'size': size,
+                'encoded': {},  # Content-Encoding -> compressed body, filled in by encoded()
+            }
+            self._size += size
+            self._evict()
+
+    def encoded(self, key, version, encoding):
+        """
+        Returns the body of the cached entry `key` compressed with
+        `encoding`, compressing it on first use and keeping the result with
+        the entry. Returns None if the entry is no longer cached (or was
+        replaced by one for a newer data version).
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or version != self.version:
+                return None
+            body = entry['encoded'].get(encoding)
+            if body is not None:
+                return body
+            source = entry['body']
+
+        # Compress outside the lock; two requests racing here just both do it
+        body = compress(source, encoding)
+        with self._lock:
+            if self._entries.get(key) is entry and encoding not in entry['encoded']:
+                entry['encoded'][encoding] = body
+                entry['size'] += len(body)
+                self._size += len(body)
+                self._evict()
+        return body
+
+    def _evict(self):
+        # Callers hold self._lock
+        while len(self._entries) > self.max_entries or self._size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= evicted['size']
+            self.stats['evictions'] += 1
+
+    def info(self):
+        """
+        Returns the cache counters plus its current size.
+        """
+        with self._lock:
+            return dict(self.stats, entries=len(self._entries), bytes=self._size, version=self.version)
+
+
+def cache_key(path, args, list_params=()):
+    """
+    Builds a cache key from the request path and its query parameters.
+    `args` is a Flask MultiDict. Parameters are sorted by name. The values
+    of `list_params` (filters that match any of their values) are
+    stripped, with empty ones dropped, and sorted, so equivalent requests
+    share an entry. Other parameters keep their values exactly and in
+    request order, since handlers only read the first one.
+    """
+    params = []
+    for name, values in sorted(args.lists()):
+        if name in list_params:
+            values = sorted(v.strip() for v in values if v.strip())
+        if values:
+            params.append((name, tuple(values)))
+    return (path, tuple(params))
+
+
+def make_etag(version, key):
+    """
+    Returns the ETag of a response: it only changes when the data version does.
+    """
+    return hashlib.sha1(repr((version, key)).encode("utf-8")).hexdigest()[:20]
+
+
+# -------------------------------------------------------------------------
+# Content-Encoding support
+# -------------------------------------------------------------------------
+def supported_encodings():
+    """
+    Returns the content codings the server can produce, best first.
+    """
+    return ["br", "gzip"] if brotli is not None else ["gzip"]
+
+
+def compress(body, encoding):
+    """
+    Compresses a whole body with "br" or "gzip".
+    """
+    if encoding == "br":
+        return brotli.compress(body, quality=COMPRESSION['brotli_quality'])
+    # mtime=0 keeps the output identical for identical input
+    return gzip.compress(body, compresslevel=COMPRESSION['gzip_level'], mtime=0)
+
+
+def compress_stream(chunks, encoding):
+    """
+    Compresses a streamed body chunk by chunk, so it never has to be held
+    in memory whole. Chunks may be str (UTF-8 encoded here) or bytes.
+    """
+    if encoding == "br":
+        compressor = brotli.Compressor(quality=COMPRESSION['stream_brotli_quality'])
+        process, finish = compressor.process, compressor.finish
+    else:
+        # wbits=31 writes a gzip header and trailer around the deflate stream
+        compressor = zlib.compressobj(COMPRESSION['stream_gzip_level'], zlib.DEFLATED, 31)
+        process, finish = compressor.compress, compressor.flush
+    try:
+        for chunk in chunks:
+            data = process(chunk.encode("utf-8") if isinstance(chunk, str) else chunk)
+            if data:
+                yield data
+        yield finish()
+    finally:
+        if hasattr(chunks, "close"):
+            chunks.close()
@@ -0,0 +1,196 @@
+# schema.py
+
+# -------------------------------------------------------------------------
+# Registry of the OWID datasets we ingest and serve.
+#
+# Each spec lists the source CSV column, the target table column and its
+# SQL type. Table DDL, insert SQL, CSV parsing (ingestion.py), API column
+# lists (app.py) and chart columns (visualization.py) are all generated
+# from here, so adding a dataset means adding a spec.
+# -------------------------------------------------------------------------
+TABLE_SPECS = {
+    "global_energy_substitution": {
+        "url": "https://ourworldindata.org/grapher/global-energy-substitution.csv?v=1&csvType=full&useColumnShortNames=false",
+        "columns": [
+            # (source CSV column, target column, SQL type)
+            ("Entity", "entity", "TEXT"),
+            ("Code", "code", "TEXT"),
+            ("Year", "year", "INT"),
+            ("Other renewables (TWh, substituted energy)", "other_renewables", "FLOAT"),
+            ("Biofuels (TWh, substituted energy)", "biofuels", "FLOAT"),
+            ("Solar (TWh, substituted energy)", "solar", "FLOAT"),
+            ("Wind (TWh, substituted energy)", "wind", "FLOAT"),
+            ("Hydropower (TWh, substituted energy)", "hydropower", "FLOAT"),
+            ("Nuclear (TWh, substituted energy)", "nuclear", "FLOAT"),
+            ("Gas (TWh, substituted energy)", "gas", "FLOAT"),
+            ("Oil (TWh, substituted energy)", "oil", "FLOAT"),
+            ("Coal (TWh, substituted energy)", "coal", "FLOAT"),
+            ("Traditional biomass (TWh, substituted energy)", "traditional_biomass", "FLOAT"),
+        ],
+    },
+    "share_electricity_renewables": {
+        "url": "https://ourworldindata.org/grapher/share-electricity-renewables.csv?v=1&csvType=full&useColumnShortNames=false",
+        "columns": [
+            ("Entity", "entity", "TEXT"),
+            ("Code", "code", "TEXT"),
+            ("Year", "year", "INT"),
+            ("Renewables - % electricity", "renewables_pct_electricity", "FLOAT"),
+        ],
+    },
+    "per_capita_energy": {
+        "url": "https://ourworldindata.org/grapher/per-capita-energy-stacked.csv?v=1&csvType=full&useColumnShortNames=false",
+        "columns": [
+            ("Entity", "entity", "TEXT"),
+            ("Code", "code", "TEXT"),
+            ("Year", "year", "INT"),
+            ("Coal per capita (kWh)", "coal_per_capita", "FLOAT"),
+            ("Oil per capita (kWh)", "oil_per_capita", "FLOAT"),
+            ("Gas per capita (kWh)", "gas_per_capita", "FLOAT"),
+            ("Nuclear per capita (kWh - equivalent)", "nuclear_per_capita", "FLOAT"),
+            ("Hydro per capita (kWh - equivalent)", "hydro_per_capita", "FLOAT"),
+            ("Wind per capita (kWh - equivalent)", "wind_per_capita", "FLOAT"),
+            ("Solar per capita (kWh - equivalent)", "solar_per_capita", "FLOAT"),
+            ("Other renewables per capita (kWh - equivalent)", "other_renewables_per_capita", "FLOAT"),
+        ],
+    },
+}
+
+
+def column_names(table: str) -> list:
+    """
+    Returns the target column names of a table, in table order (without `id`).
+    """
+    return [target for _, target, _ in TABLE_SPECS[table]["columns"]]
+
+
+def value_columns(table: str) -> list:
+    """
+    Returns the numeric measurement columns of a table.
+    """
+    return [target for _, target, sql_type in TABLE_SPECS[table]["columns"] if sql_type == "FLOAT"]
+
+
+def source_columns(table: str) -> dict:
+    """
+    Maps each source CSV column of a table to its target column.
+    """
+    return {source: target for source, target, _ in TABLE_SPECS[table]["columns"]}
+
+
+def column_types(table: str) -> dict:
+    """
+    Maps each target column of a table to its SQL type.
+    """
+    return {target: sql_type for _, target, sql_type in TABLE_SPECS[table]["columns"]}
+
+
+def api_columns(table: str) -> list:
+    """
+    Returns the columns served by the API for a table.
+    """
+    return ["id"] + column_names(table)
+
+
+def table_ddl(table: str, name: str = None) -> str:
+    """
+    Returns the CREATE TABLE statement for a table. `name` overrides the
+    table name, e.g. for a staging copy.
+    """
+    columns = ",\n".join(
+        f"        {target} {sql_type}" for _, target, sql_type in TABLE_SPECS[table]["columns"]
+    )
+    return f"""
+    CREATE TABLE IF NOT EXISTS {name or table} (
+        id SERIAL PRIMARY KEY,
+{columns}
+    );
+    """
+
+
+def insert_sql(table: str, name: str = None) -> str:
+    """
+    Returns a parameterized INSERT statement covering every target column.
+    """
+    columns = column_names(table)
+    placeholders = ", ".join(["%s"] * len(columns))
+    return f"INSERT INTO {name or table} ({', '.join(columns)}) VALUES ({placeholders})"
+
+
+def total_expression(table: str) -> str:
+    """
+    Returns a SQL expression summing every measurement column of a table,
+    treating missing values as zero.
+    """
+    return " + ".join(f"COALESCE({column}, 0)" for column in value_columns(table))
+
+
+# -------------------------------------------------------------------------
+# Pre-aggregated materialized views maintained by ingestion.py.
+# Each view is rebuilt or refreshed whenever its source table is reloaded.
+# `query` reads from `{source}`: the table, or its staging copy when a
+# reload builds the view ahead of the swap (see ingestion.swap_in_staging).
+# `key` gets a unique index (needed for REFRESH ... CONCURRENTLY).
+# `aggregate` names the API aggregation (app.py) the view can answer.
+# -------------------------------------------------------------------------
+MATERIALIZED_VIEWS = {
+    # Per-year totals of each source, summed over all entities
+    "global_energy_yearly_totals": {
+        "table": "global_energy_substitution",
+        "query": f"""
+            SELECT year,
+                {", ".join(f"SUM({c}) AS {c}" for c in value_columns("global_energy_substitution"))},
+                SUM({total_expression("global_energy_substitution")}) AS total
+            FROM {{source}}
+            GROUP BY year
+        """,
+        "key": ["year"],
+        "indexes": [],
+        "aggregate": "yearly",
+    },
+    # Per-capita totals across sources, ranked within each year
+    "per_capita_energy_ranked": {
+        "table": "per_capita_energy",
+        "query": f"""
+            SELECT entity, code, year,
+                {", ".join(value_columns("per_capita_energy"))},
+                {total_expression("per_capita_energy")} AS total_per_capita,
+                RANK() OVER (
+                    PARTITION BY year
+                    ORDER BY {total_expression("per_capita_energy")} DESC
+                ) AS rank
+            FROM {{source}}
+            WHERE entity IS NOT NULL
+        """,
+        "key": ["entity", "year"],
+        "indexes": [["year", "rank"]],
+        "aggregate": "ranked",
+    },
+}
+
+
+def views_for(table: str) -> list:
+    """
+    Returns the names of the materialized views built from a table.
+    """
+    return [view for view, spec in MATERIALIZED_VIEWS.items() if spec["table"] == table]
+
+
+def view_indexes(view: str) -> list:
+    """
+    Returns (name suffix, columns, unique) of each index of a view.
+    """
+    spec = MATERIALIZED_VIEWS[view]
+    return [("key", spec["key"], True)] + [
+        (f"{'_'.join(columns)}_idx", columns, False) for columns in spec["indexes"]
+    ]
+
+
+def aggregate_view(table: str, aggregate: str):
+    """
+    Returns the materialized view of `table` that answers `aggregate`
+    ("yearly" or "ranked"), or None when there is none.
+    """
+    for view in views_for(table):
+        if MATERIALIZED_VIEWS[view].get("aggregate") == aggregate:
+            return view
+    return None
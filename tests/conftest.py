@@ -0,0 +1,101 @@
+# tests/conftest.py
+
+import os
+import sys
+import time
+
+import psycopg2
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+import app as api
+
+# Tests that need PostgreSQL run against their own database on the DB_CONFIG server
+TEST_DB_CONFIG = dict(api.DB_CONFIG, dbname=os.environ.get("ENERGY_TEST_DBNAME", "energy_test"))
+
+
+@pytest.fixture(scope="session")
+def standin_snapshot():
+    """
+    Synthetic data at scale 1 as an in-memory columnar snapshot (see benchmarks/seed.py).
+    """
+    from seed import seed_standin
+    return seed_standin(1)
+
+
+@pytest.fixture
+def standin_client(standin_snapshot):
+    """
+    A Flask test client answering the data endpoints from the in-memory
+    snapshot, so no database is needed.
+    """
+    saved = (api.COLUMNAR_CONFIG['enabled'], api.columnar_store.snapshot,
+             api.CACHE_CONFIG['version_check_interval'], dict(api._version_state))
+    api.COLUMNAR_CONFIG['enabled'] = True
+    api.columnar_store.snapshot = standin_snapshot
+    api.CACHE_CONFIG['version_check_interval'] = float("inf")
+    api._version_state.update(version=standin_snapshot.version, checked_at=time.monotonic())
+    api.response_cache.set_version(standin_snapshot.version)
+    yield api.app.test_client()
+    (api.COLUMNAR_CONFIG['enabled'], api.columnar_store.snapshot,
+     api.CACHE_CONFIG['version_check_interval']) = saved[:3]
+    api._version_state.update(saved[3])
+    api.response_cache.set_version(None)  # drops the entries cached by the test
+
+
+def reset_pool():
+    if api._pool is not None:
+        api._pool.closeall()
+    api._pool = None
+    api._last_used.clear()
+    api._broken['at'] = float("-inf")
+
+
+@pytest.fixture(scope="session")
+def db_config():
+    """
+    The test database settings; skips the test when it can't be reached.
+    """
+    try:
+        psycopg2.connect(connect_timeout=3, **TEST_DB_CONFIG).close()
+    except psycopg2.OperationalError as error:
+        pytest.skip(f"PostgreSQL test database not reachable: {error}")
+    return TEST_DB_CONFIG
+
+
+@pytest.fixture(scope="session")
+def seeded_db(db_config):
+    """
+    The test database with the synthetic tables at scale 1 (seed 0).
+    """
+    from seed import seed_postgres
+    conn = psycopg2.connect(**db_config)
+    try:
+        seed_postgres(1, conn=conn)
+    finally:
+        conn.close()
+    return db_config
+
+
+@pytest.fixture
+def db_client(seeded_db):
+    """
+    A Flask test client on the seeded test database, with a fresh pool
+    and an empty response cache that checks the data version on every
+    request.
+    """
+    saved = dict(api.DB_CONFIG), api.CACHE_CONFIG['version_check_interval']
+    api.DB_CONFIG.update(seeded_db)
+    api.CACHE_CONFIG['version_check_interval'] = 0
+    reset_pool()
+    api._version_state.update(version=None, checked_at=0.0)
+    api.response_cache.set_version(None)
+    yield api.app.test_client()
+    reset_pool()
+    api.DB_CONFIG.update(saved[0])
+    api.CACHE_CONFIG['version_check_interval'] = saved[1]
+    api._version_state.update(version=None, checked_at=0.0)
+    api.response_cache.set_version(None)
@@ -0,0 +1,83 @@
+# tests/test_aggregations.py
+
+import pandas as pd
+import pytest
+
+from data_sources import filter_frame, top_frame
+from schema import value_columns
+from seed import synthetic_table
+
+# The seeded database holds synthetic_table(table) for every table, so each
+# aggregation is checked against the same computation in pandas.
+
+
+def with_totals(df, table):
+    columns = value_columns(table)
+    total = df[columns[0]].fillna(0)
+    for column in columns[1:]:
+        total = total + df[column].fillna(0)  # added left to right, like the SQL
+    return df.assign(total=total)
+
+
+def as_records(df, columns):
+    return [
+        {c: None if pd.isna(v) else v.item() if hasattr(v, "item") else v for c, v in zip(columns, row)}
+        for row in df[columns].itertuples(index=False)
+    ]
+
+
+def assert_records(actual, expected, key):
+    assert len(actual) == len(expected)
+    for got, want in zip(sorted(actual, key=key), sorted(expected, key=key)):
+        assert got.keys() == want.keys()
+        for name, value in want.items():
+            if isinstance(value, float):
+                assert got[name] == pytest.approx(value, rel=1e-9), name
+            else:
+                assert got[name] == value, name
+
+
+@pytest.mark.parametrize("endpoint, table", [
+    ("per_capita_energy", "per_capita_energy"),                 # from the ranked view
+    ("share_renewables", "share_electricity_renewables"),       # from the table
+])
+def test_totals(db_client, endpoint, table):
+    df = synthetic_table(table)
+    df = with_totals(df[df["year"].between(2010, 2012) & df["entity"].notna()], table)
+    expected = as_records(df, ["entity", "code", "year", "total"])
+    actual = db_client.get(f"/api/{endpoint}/totals?year_from=2010&year_to=2012").get_json()
+    assert_records(actual, expected, lambda r: (r["year"], r["entity"]))
+
+
+@pytest.mark.parametrize("query, filters, n, metric", [
+    ("year=2000,2001&n=5", {"year": [2000, 2001]}, 5, "total"),                 # from the ranked view
+    ("year=2000&n=3&metric=coal_per_capita", {"year": [2000]}, 3, "coal_per_capita"),
+    ("year=2000&n=2&entity=World,Entity%20000003,Entity%20000005",
+     {"year": [2000], "entity": ["World", "Entity 000003", "Entity 000005"]}, 2, "total"),
+])
+def test_top(db_client, query, filters, n, metric):
+    table = "per_capita_energy"
+    expected = top_frame(filter_frame(synthetic_table(table), filters), table, n, metric)
+    expected = as_records(expected, ["entity", "code", "year"] + value_columns(table) + ["total", "rank"])
+    actual = db_client.get(f"/api/per_capita_energy/top?{query}").get_json()
+    assert_records(actual, expected, lambda r: (r["year"], r["rank"], r["entity"]))
+
+
+@pytest.mark.parametrize("query, stat, entities", [
+    ("", "sum", None),                                                          # from the yearly view
+    ("&stat=avg", "avg", None),
+    ("&entity=World", "sum", ["World"]),
+])
+def test_yearly(db_client, query, stat, entities):
+    table = "global_energy_substitution"
+    df = synthetic_table(table)
+    df = df[df["year"].between(1990, 2000)]
+    if entities:
+        df = df[df["entity"].isin(entities)]
+    columns = value_columns(table) + ["total"]
+    grouped = with_totals(df, table).groupby("year")[columns]
+    # SUM of only NULLs is NULL in SQL
+    expected = grouped.sum(min_count=1) if stat == "sum" else grouped.mean()
+    expected = as_records(expected.reset_index(), ["year"] + columns)
+    actual = db_client.get(f"/api/global_energy_substitution/yearly?year_from=1990&year_to=2000{query}").get_json()
+    assert_records(actual, expected, lambda r: r["year"])
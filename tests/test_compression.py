@@ -0,0 +1,88 @@
+# tests/test_compression.py
+
+import gzip
+
+import pytest
+
+import app as api
+import response_cache
+
+PATH = "/api/per_capita_energy?year=2000"
+
+
+def decompress(resp):
+    encoding = resp.headers.get("Content-Encoding")
+    if encoding == "br":
+        brotli = pytest.importorskip("brotli")
+        return brotli.decompress(resp.get_data())
+    return gzip.decompress(resp.get_data()) if encoding == "gzip" else resp.get_data()
+
+
+@pytest.fixture
+def compressions(monkeypatch):
+    """
+    Records every whole-body compression as its encoding.
+    """
+    calls = []
+    original = response_cache.compress
+
+    def compress(body, encoding):
+        calls.append(encoding)
+        return original(body, encoding)
+
+    monkeypatch.setattr(response_cache, "compress", compress)
+    return calls
+
+
+@pytest.mark.parametrize("accept, encoding", [
+    ("gzip", "gzip"),
+    ("br", "br"),
+    ("gzip, br", "br"),
+    ("br;q=0.5, gzip", "gzip"),
+    ("identity", None),
+    ("", None),
+])
+def test_encoding_is_negotiated(standin_client, accept, encoding):
+    if encoding == "br":
+        pytest.importorskip("brotli")
+    plain = standin_client.get(PATH).get_data()
+    resp = standin_client.get(PATH, headers={"Accept-Encoding": accept})
+    assert resp.headers.get("Content-Encoding") == encoding
+    assert "Accept-Encoding" in resp.headers["Vary"]
+    assert decompress(resp) == plain
+
+
+def test_compressed_copies_are_cached_per_entry(standin_client, compressions):
+    pytest.importorskip("brotli")
+    bodies = [
+        standin_client.get(PATH, headers={"Accept-Encoding": encoding}).get_data()
+        for encoding in ("gzip", "gzip", "br", "br")
+    ]
+    assert compressions == ["gzip", "br"]  # once per encoding, then served from the entry
+    assert bodies[0] == bodies[1] and bodies[2] == bodies[3]
+
+    entries = list(api.response_cache._entries.values())
+    assert len(entries) == 1
+    entry = entries[0]
+    assert set(entry["encoded"]) == {"gzip", "br"}
+    assert entry["size"] == len(entry["body"]) + sum(len(b) for b in entry["encoded"].values())
+
+
+def test_each_encoding_has_its_own_etag(standin_client):
+    plain = standin_client.get(PATH)
+    gzipped = standin_client.get(PATH, headers={"Accept-Encoding": "gzip"})
+    assert plain.headers["ETag"] != gzipped.headers["ETag"]
+    revalidated = standin_client.get(
+        PATH, headers={"Accept-Encoding": "gzip", "If-None-Match": gzipped.headers["ETag"]}
+    )
+    assert revalidated.status_code == 304
+
+
+def test_small_and_precompressed_bodies_are_sent_as_they_are(standin_client):
+    small = standin_client.get(
+        "/api/per_capita_energy?year=2000&limit=1&fields=year", headers={"Accept-Encoding": "gzip"}
+    )
+    assert len(small.get_data()) < api.COMPRESSION["min_size"]
+    assert "Content-Encoding" not in small.headers
+    parquet = standin_client.get(PATH + "&format=parquet", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in parquet.headers
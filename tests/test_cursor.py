@@ -0,0 +1,30 @@
+# tests/test_cursor.py
+
+import base64
+import json
+
+import pytest
+
+from app import ApiError, decode_cursor, encode_cursor
+
+
+def make_cursor(position):
+    return base64.urlsafe_b64encode(json.dumps(position).encode("utf-8")).decode("ascii")
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor({"year": 2000, "entity": "France"})
+    assert decode_cursor(cursor) == [2000, "France"]
+
+
+@pytest.mark.parametrize("position", [["abc", 5], [None, "x"], [True, "x"], [2000, 5], [2000]])
+def test_tampered_cursor_is_rejected(position):
+    with pytest.raises(ApiError):
+        decode_cursor(make_cursor(position))
+
+
+@pytest.mark.parametrize("position", [["abc", 5], [None, "x"]])
+def test_tampered_cursor_is_a_bad_request(standin_client, position):
+    resp = standin_client.get(f"/api/per_capita_energy?limit=10&cursor={make_cursor(position)}")
+    assert resp.status_code == 400
+    assert resp.get_json() == {"error": "Invalid cursor"}
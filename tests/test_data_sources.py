@@ -0,0 +1,49 @@
+# tests/test_data_sources.py
+
+import threading
+
+import pandas as pd
+import pytest
+from werkzeug.serving import make_server
+
+import app as api
+from data_sources import ApiSource, PostgresSource, SnapshotSource, save_snapshot
+
+FETCHES = [
+    ("global_energy_substitution", {}, None),
+    ("per_capita_energy", {"year": 2023}, None),
+    ("per_capita_energy", {"year_from": 2000, "year_to": 2002, "fields": "entity,year,coal_per_capita"}, None),
+    ("share_renewables", {"entity": ["World", "Entity 000008"], "code": ["E000008", "OWID_WRL"]}, None),
+    ("share_renewables", {"code": ["E000003", "OWID_WRL"]}, None),
+    ("per_capita_energy", {"year": 2023, "n": 15}, "top"),
+    ("per_capita_energy", {"year": [2000, 2001], "n": 3, "metric": "coal_per_capita"}, "top"),
+]
+
+
+@pytest.fixture
+def sources(db_client, seeded_db, tmp_path):
+    """
+    The three data sources over the same seeded data: the API (served on
+    a local port), PostgreSQL, and a snapshot saved from PostgreSQL.
+    """
+    server = make_server("127.0.0.1", 0, api.app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    postgres = PostgresSource(seeded_db)
+    path = tmp_path / "snapshot.pkl"
+    save_snapshot(postgres, path)
+    yield {
+        "api": ApiSource(f"http://127.0.0.1:{server.server_port}"),
+        "postgres": postgres,
+        "snapshot": SnapshotSource(path),
+    }
+    postgres.close()
+    server.shutdown()
+
+
+@pytest.mark.parametrize("endpoint, params, aggregation", FETCHES)
+def test_sources_return_identical_frames(sources, endpoint, params, aggregation):
+    frames = {name: source.fetch(endpoint, params, aggregation) for name, source in sources.items()}
+    assert len(frames["postgres"]) > 0
+    pd.testing.assert_frame_equal(frames["api"], frames["postgres"], check_exact=True)
+    pd.testing.assert_frame_equal(frames["snapshot"], frames["postgres"], check_exact=True)
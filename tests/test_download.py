@@ -0,0 +1,152 @@
+# tests/test_download.py
+
+import hashlib
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import ingestion
+from ingestion import create_http_session, download_csv, download_csv_if_changed, stream_csv
+
+CSV = "Entity,Code,Year,Value\nWorld,OWID_WRL,2000,1.5\nWorld,OWID_WRL,2001,2.5\n"
+
+
+class SourceServer(ThreadingHTTPServer):
+    """
+    Serves `files` (path -> CSV text) like the OWID downloads, with an
+    ETag per file and 304 answers to a matching If-None-Match. `delays`
+    (path -> seconds) adds latency before a file is sent.
+    """
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), SourceHandler)
+        self.files = {}
+        self.delays = {}
+        self.served_at = {}     # path -> time.monotonic() when its body was sent
+        self.etags = True
+        self.failures = 0       # requests to answer with 503 first
+        self.requests = []      # (path, If-None-Match) of every request
+
+    def url(self, path):
+        return f"http://127.0.0.1:{self.server_address[1]}{path}"
+
+
+class SourceHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        server.requests.append((self.path, self.headers.get("If-None-Match")))
+        if server.failures:
+            server.failures -= 1
+            self.send_response(503)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if self.path not in server.files:
+            self.send_error(404)
+            return
+        time.sleep(server.delays.get(self.path, 0))
+        body = server.files[self.path].encode("utf-8")
+        etag = '"' + hashlib.md5(body).hexdigest() + '"'
+        if server.etags and self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/csv; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        if server.etags:
+            self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(body)
+        server.served_at[self.path] = time.monotonic()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def source_server():
+    server = SourceServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_download_csv(source_server):
+    source_server.files["/data.csv"] = CSV
+    with create_http_session() as session:
+        assert download_csv(source_server.url("/data.csv"), session).getvalue() == CSV
+
+
+def test_download_retries_server_errors(source_server):
+    source_server.files["/data.csv"] = CSV
+    source_server.failures = 1
+    with create_http_session() as session:
+        assert download_csv(source_server.url("/data.csv"), session).getvalue() == CSV
+    assert len(source_server.requests) == 2
+
+
+def test_download_csv_if_changed_uses_etags(source_server):
+    source_server.files["/data.csv"] = CSV
+    url = source_server.url("/data.csv")
+    with create_http_session() as session:
+        csv_file, meta = download_csv_if_changed(url, None, session)
+        assert csv_file.getvalue() == CSV
+        assert meta["etag"] and meta["content_hash"] == hashlib.sha256(CSV.encode("utf-8")).hexdigest()
+
+        # Unchanged: the server answers 304 and the stored metadata is kept
+        csv_file, same_meta = download_csv_if_changed(url, meta, session)
+        assert csv_file is None and same_meta == meta
+        assert source_server.requests[-1] == ("/data.csv", meta["etag"])
+
+        # Changed: the new body and its ETag come back
+        source_server.files["/data.csv"] = CSV + "World,OWID_WRL,2002,3.5\n"
+        csv_file, new_meta = download_csv_if_changed(url, meta, session)
+        assert csv_file.getvalue().endswith("2002,3.5\n")
+        assert new_meta["etag"] != meta["etag"]
+
+
+def test_download_csv_if_changed_falls_back_to_the_content_hash(source_server):
+    source_server.files["/data.csv"] = CSV
+    source_server.etags = False
+    url = source_server.url("/data.csv")
+    csv_file, meta = download_csv_if_changed(url)
+    assert csv_file is not None and meta["etag"] is None
+
+    csv_file, new_meta = download_csv_if_changed(url, meta)
+    assert csv_file is None and new_meta["content_hash"] == meta["content_hash"]
+
+
+def test_stream_csv_yields_whole_lines(source_server):
+    source_server.files["/data.csv"] = CSV
+    lines = list(stream_csv(source_server.url("/data.csv"), chunk_size=7))
+    assert lines == CSV.splitlines(keepends=True)
+
+
+def test_datasets_load_as_their_own_downloads_finish(source_server, monkeypatch):
+    delays = {"fast": 0.2, "medium": 0.5, "slow": 1.0}
+    for name, delay in delays.items():
+        source_server.files[f"/{name}.csv"] = CSV
+        source_server.delays[f"/{name}.csv"] = delay
+    loads = []
+    monkeypatch.setattr(
+        ingestion, "load_table",
+        lambda conn, name, csv_file, *args: loads.append((name, time.monotonic(), csv_file.getvalue()))
+    )
+
+    start = time.monotonic()
+    datasets = {name: {"url": source_server.url(f"/{name}.csv")} for name in delays}
+    ingestion.download_and_load(None, datasets)
+    elapsed = time.monotonic() - start
+
+    # Downloaded side by side: about the slowest delay, not the sum
+    assert max(delays.values()) <= elapsed < max(delays.values()) + 0.4
+    assert [name for name, _, _ in loads] == ["fast", "medium", "slow"]
+    assert all(body == CSV for _, _, body in loads)
+    # The fast table is loaded while the slow one is still downloading
+    assert loads[0][1] < source_server.served_at["/slow.csv"]
@@ -0,0 +1,63 @@
+# tests/test_filters.py
+
+from urllib.parse import quote
+
+import pytest
+from werkzeug.datastructures import MultiDict
+
+import app as api
+from columnar import ColumnarTable, Snapshot
+from schema import api_columns
+
+TABLE = "per_capita_energy"
+ENTITIES = ["Korea, Rep.", "Korea", "Rep.", "Back\\slash"]
+
+
+@pytest.mark.parametrize("raw, values", [
+    ("France,Germany", ["France", "Germany"]),
+    ("Korea\\, Rep.,France", ["Korea, Rep.", "France"]),
+    ("Back\\\\slash", ["Back\\slash"]),
+])
+def test_split_list_value(raw, values):
+    assert api.split_list_value(raw) == values
+
+
+@pytest.mark.parametrize("value", ENTITIES)
+def test_escaped_values_come_back_whole(value):
+    assert api.split_list_value(api.escape_list_value(value)) == [value]
+
+
+def test_parse_filters_keeps_escaped_commas():
+    args = MultiDict([("entity", "Korea\\, Rep."), ("entity", "France,Germany")])
+    assert api.parse_filters(args)["entity"] == ["Korea, Rep.", "France", "Germany"]
+
+
+@pytest.fixture
+def comma_client(standin_client, standin_snapshot):
+    """
+    The stand-in client with a table whose entity names hold commas.
+    """
+    columns = api_columns(TABLE)
+    rows = [
+        tuple({"id": i, "entity": entity, "year": 2000}.get(column) for column in columns)
+        for i, entity in enumerate(sorted(ENTITIES), 1)
+    ]
+    tables = dict(standin_snapshot.tables, **{TABLE: ColumnarTable(TABLE, columns, rows)})
+    api.columnar_store.snapshot = Snapshot(standin_snapshot.version, tables)
+    return standin_client
+
+
+def test_get_filter_with_an_escaped_comma(comma_client):
+    entity = quote(api.escape_list_value("Korea, Rep."))
+    resp = comma_client.get(f"/api/{TABLE}?fields=entity&entity={entity}")
+    assert [row["entity"] for row in resp.get_json()] == ["Korea, Rep."]
+
+
+def test_batch_list_items_are_taken_whole(comma_client):
+    resp = comma_client.post("/api/batch", json={"queries": [
+        {"endpoint": TABLE, "params": {"fields": "entity", "entity": ["Korea, Rep."]}},
+        {"endpoint": TABLE, "params": {"fields": "entity", "entity": "Korea,Rep."}},
+    ]})
+    first, second = resp.get_json()["results"]
+    assert [row["entity"] for row in first["data"]] == ["Korea, Rep."]
+    assert sorted(row["entity"] for row in second["data"]) == ["Korea", "Rep."]
@@ -0,0 +1,54 @@
+# tests/test_formats.py
+
+import csv
+import io
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+QUERIES = [
+    "/api/per_capita_energy?year=2000",
+    "/api/share_renewables?code=E000001,E000002&fields=year",
+    "/api/global_energy_substitution?limit=25",
+    "/api/per_capita_energy/top?year=2010&n=5",
+]
+
+
+def decode(fmt, body):
+    if fmt == "csv":
+        return list(csv.DictReader(io.StringIO(body.decode("utf-8"))))
+    if fmt == "arrow":
+        return pa.ipc.open_stream(body).read_all().to_pylist()
+    return pq.read_table(io.BytesIO(body)).to_pylist()
+
+
+def as_csv_text(records):
+    # CSV has no types or NULLs: numbers are written with repr(), NULL as ""
+    return [{k: "" if v is None else str(v) for k, v in record.items()} for record in records]
+
+
+@pytest.mark.parametrize("client", ["standin_client", "db_client"])
+@pytest.mark.parametrize("fmt", ["csv", "arrow", "parquet"])
+@pytest.mark.parametrize("path", QUERIES)
+def test_formats_round_trip_to_the_json_records(request, client, fmt, path):
+    if client == "standin_client" and "/top" in path:
+        pytest.skip("aggregations need PostgreSQL")
+    client = request.getfixturevalue(client)
+    records = client.get(path).get_json()
+    assert records
+
+    resp = client.get(path + "&format=" + fmt)
+    assert resp.status_code == 200
+    decoded = decode(fmt, resp.get_data())
+    assert decoded == (as_csv_text(records) if fmt == "csv" else records)
+
+
+@pytest.mark.parametrize("fmt", ["csv", "arrow", "parquet"])
+def test_accept_header_picks_the_format(standin_client, fmt):
+    mimetype = {"csv": "text/csv", "arrow": "application/vnd.apache.arrow.stream",
+                "parquet": "application/vnd.apache.parquet"}[fmt]
+    resp = standin_client.get("/api/per_capita_energy?year=2000", headers={"Accept": mimetype})
+    assert resp.mimetype == mimetype
+    assert decode(fmt, resp.get_data()) == decode(fmt, standin_client.get(
+        "/api/per_capita_energy?year=2000&format=" + fmt).get_data())
@@ -0,0 +1,80 @@
+# tests/test_pool.py
+
+import threading
+import time
+
+import psycopg2
+import pytest
+
+import app as api
+
+# One request per kind of database access: version check, streamed table,
+# page, aggregation and batch
+REQUESTS = [
+    ("get", "/api/per_capita_energy", None),
+    ("get", "/api/per_capita_energy?year=2000", None),
+    ("get", "/api/per_capita_energy/top?year=2000&n=5", None),
+    ("post", "/api/batch", {"queries": [{"endpoint": "per_capita_energy", "params": {"year": 2001}}]}),
+]
+
+
+def pooled_backends(client, count):
+    """
+    Fills the pool with `count` recently used connections and returns
+    their server process ids.
+    """
+    client.get("/api/per_capita_energy?year=1999")
+    conns = [api.get_db_connection() for _ in range(count)]
+    pids = [conn.get_backend_pid() for conn in conns]
+    for conn in conns:
+        api.release_db_connection(conn)
+    return pids
+
+
+def terminate(db_config, pids):
+    """
+    Ends the given server processes, as a database restart would.
+    """
+    admin = psycopg2.connect(**db_config)
+    admin.autocommit = True
+    try:
+        with admin.cursor() as cur:
+            for pid in pids:
+                cur.execute("SELECT pg_terminate_backend(%s)", (pid,))
+    finally:
+        admin.close()
+    time.sleep(0.2)  # let the backends exit
+
+
+@pytest.mark.parametrize("check_version", [True, False])
+@pytest.mark.parametrize("method, path, body", REQUESTS)
+def test_requests_survive_a_restart(db_client, seeded_db, method, path, body, check_version):
+    if not check_version:
+        # The handler's own query is the first to meet a dead connection
+        api.CACHE_CONFIG['version_check_interval'] = float("inf")
+        api._version_state.update(checked_at=time.monotonic())
+    terminate(seeded_db, pooled_backends(db_client, 3))
+    reconnects = api.POOL_STATS['reconnects']
+
+    for _ in range(3):
+        api.response_cache.set_version(None)
+        resp = getattr(db_client, method)(path, json=body)
+        assert resp.status_code == 200, resp.get_data(as_text=True)
+        assert resp.get_json()
+    assert api.POOL_STATS['reconnects'] > reconnects
+
+
+def test_concurrent_requests_survive_a_restart(db_client, seeded_db):
+    terminate(seeded_db, pooled_backends(db_client, 4))
+    statuses = []
+
+    def reader(year):
+        client = db_client.application.test_client()
+        statuses.append(client.get(f"/api/per_capita_energy?year={year}").status_code)
+
+    threads = [threading.Thread(target=reader, args=(year,)) for year in range(2000, 2008)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert statuses == [200] * len(threads)
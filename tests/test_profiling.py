@@ -0,0 +1,45 @@
+# tests/test_profiling.py
+
+import threading
+
+from profiling import RunProfile
+
+SIZE = 20 * 1024 * 1024
+
+
+def test_stage_peaks_and_run_peak():
+    profile = RunProfile()
+    dataset = profile.dataset("table")
+    with dataset.stage("parse"):
+        buffer = bytearray(SIZE)
+        del buffer
+    with dataset.stage("write"):
+        pass
+    report = profile.finish()
+    stages = report["datasets"]["table"]["stages"]
+    assert stages["parse"]["peak_memory_bytes"] >= SIZE
+    assert stages["write"]["peak_memory_bytes"] < SIZE
+    assert report["peak_memory_bytes"] >= SIZE
+
+
+def test_threaded_stages_report_only_the_run_peak():
+    profile = RunProfile(stage_peaks=False)
+    started, release = threading.Event(), threading.Event()
+
+    def download():
+        buffer = bytearray(SIZE)
+        started.set()
+        release.wait(5)
+        del buffer
+
+    thread = threading.Thread(target=profile.dataset("a").call, args=("download", download))
+    thread.start()
+    started.wait(5)
+    # A stage starting on another thread must not hide the download's peak
+    with profile.dataset("b").stage("parse"):
+        release.set()
+        thread.join()
+    report = profile.finish()
+    for dataset in report["datasets"].values():
+        assert all("peak_memory_bytes" not in stats for stats in dataset["stages"].values())
+    assert report["peak_memory_bytes"] >= SIZE
@@ -0,0 +1,135 @@
+# tests/test_reload.py
+
+import threading
+import time
+
+import psycopg2
+
+import ingestion
+import schema
+from ingestion import SWAP_LOCK_TIMEOUT, swap_in_staging, write_rows
+from seed import synthetic_table
+
+TABLE = "per_capita_energy"
+VIEW = "per_capita_energy_ranked"
+YEARS = range(1965, 2024)
+
+
+def reload(conn, seed):
+    """
+    Reloads the table with synthetic data: staging load, indexes, swap.
+    """
+    write_rows(conn, TABLE, [synthetic_table(TABLE, seed=seed)])
+
+
+def expected_bodies(client):
+    return {year: client.get(f"/api/per_capita_energy?year={year}").get_json() for year in YEARS}
+
+
+def test_reads_during_reloads_see_one_whole_table(db_client, seeded_db):
+    conn = psycopg2.connect(**seeded_db)
+    old = expected_bodies(db_client)
+    assert all(old.values())
+
+    reload(conn, seed=1)
+    new = expected_bodies(db_client)
+    assert new != old
+
+    errors, results = [], []
+    done = threading.Event()
+
+    def reader():
+        client = db_client.application.test_client()
+        i = 0
+        while not done.is_set():
+            year = YEARS[i % len(YEARS)]
+            i += 1
+            resp = client.get(f"/api/per_capita_energy?year={year}")
+            if resp.status_code != 200:
+                errors.append((resp.status_code, resp.get_data(as_text=True)))
+            else:
+                results.append((year, resp.get_json()))
+
+    threads = [threading.Thread(target=reader) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    try:
+        for seed in (0, 1, 0):
+            reload(conn, seed)
+            time.sleep(0.2)
+    finally:
+        done.set()
+        for thread in threads:
+            thread.join()
+        conn.close()
+
+    assert not errors
+    assert len(results) > 50
+    for year, body in results:
+        # Every response is the complete old or new table, never empty or mixed
+        assert body == old[year] or body == new[year]
+
+
+def test_swap_retries_while_a_long_reader_holds_the_table(db_client, seeded_db, monkeypatch):
+    conn = psycopg2.connect(**seeded_db)
+    reader = psycopg2.connect(**seeded_db)
+    try:
+        # Load the staging table only; the swap is run below
+        with monkeypatch.context() as patch:
+            patch.setattr(ingestion, "swap_in_staging", lambda conn, table: None)
+            reload(conn, seed=0)
+        with reader.cursor() as cur:
+            cur.execute(f"SELECT count(*) FROM {TABLE}")  # holds its lock until the transaction ends
+        lock_seconds = float(SWAP_LOCK_TIMEOUT.rstrip("s"))
+        threading.Timer(lock_seconds * 1.5, reader.rollback).start()
+
+        start = time.monotonic()
+        swap_in_staging(conn, TABLE)  # times out once, then succeeds after the reader is gone
+        assert time.monotonic() - start > lock_seconds
+
+        resp = db_client.get("/api/per_capita_energy?year=2000")
+        assert resp.status_code == 200 and resp.get_json()
+    finally:
+        reader.close()
+        conn.close()
+
+
+def test_readers_do_not_wait_for_view_rebuilds(seeded_db, monkeypatch):
+    delay = 2.0
+    conn = psycopg2.connect(**seeded_db)
+    latencies, done = [], threading.Event()
+
+    def reader():
+        reads = psycopg2.connect(**seeded_db)
+        reads.autocommit = True
+        try:
+            with reads.cursor() as cur:
+                while not done.is_set():
+                    start = time.monotonic()
+                    cur.execute(f"SELECT count(*) FROM {TABLE} WHERE year = 2000")
+                    cur.execute(f"SELECT count(*) FROM {VIEW} WHERE year = 2000")
+                    latencies.append(time.monotonic() - start)
+                    time.sleep(0.01)
+        finally:
+            reads.close()
+
+    thread = threading.Thread(target=reader)
+    try:
+        with monkeypatch.context() as patch:
+            # A view that takes `delay` seconds to build
+            query = schema.MATERIALIZED_VIEWS[VIEW]["query"]
+            patch.setitem(schema.MATERIALIZED_VIEWS[VIEW], "query", f"""
+                WITH pause AS (SELECT pg_sleep({delay}))
+                SELECT * FROM ({query}) ranked WHERE (SELECT count(*) FROM pause) = 1
+            """)
+            thread.start()
+            start = time.monotonic()
+            reload(conn, seed=0)
+            assert time.monotonic() - start > delay
+    finally:
+        done.set()
+        thread.join()
+        reload(conn, seed=0)  # back to the normal view definition
+        conn.close()
+
+    assert latencies and max(latencies) < delay / 2
@@ -0,0 +1,35 @@
+# tests/test_response_cache.py
+
+from werkzeug.datastructures import MultiDict
+
+from app import LIST_FILTERS
+from response_cache import cache_key
+
+
+def key(query):
+    args = MultiDict([tuple(pair.split("=", 1)) for pair in query.split("&")])
+    return cache_key("/api/per_capita_energy", args, LIST_FILTERS)
+
+
+def test_list_filter_values_are_normalized():
+    assert key("entity=France&entity=Germany") == key("entity=Germany&entity=France")
+    assert key("year=2000&year= 2001&year=") == key("year=2001&year=2000")
+
+
+def test_repeated_scalar_parameters_keep_their_order():
+    assert key("fields=entity&fields=year") != key("fields=year&fields=entity")
+    assert key("limit=1&limit=3") != key("limit=3&limit=1")
+    assert key("limit=&limit=3") != key("limit=3")
+
+
+def test_repeated_scalar_parameters_are_not_served_from_each_other(standin_client):
+    first = standin_client.get("/api/per_capita_energy?year=2000&fields=entity&fields=year")
+    second = standin_client.get("/api/per_capita_energy?year=2000&fields=year&fields=entity")
+    assert first.status_code == second.status_code == 200
+    assert list(first.get_json()[0]) == ["entity"]
+    assert list(second.get_json()[0]) == ["year"]
+
+    first = standin_client.get("/api/per_capita_energy?limit=1&limit=3")
+    second = standin_client.get("/api/per_capita_energy?limit=3&limit=1")
+    assert len(first.get_json()) == 1
+    assert len(second.get_json()) == 3
@@ -0,0 +1,29 @@
+# tests/test_rolling.py
+
+import psycopg2
+from werkzeug.datastructures import MultiDict
+
+import app as api
+from schema import value_columns
+
+TABLE = "per_capita_energy"
+METRIC = value_columns(TABLE)[0]
+
+
+def test_window_spans_years_not_rows(seeded_db):
+    conn = psycopg2.connect(**seeded_db)
+    try:
+        with conn.cursor() as cur:
+            # A temporary table shadows the real one for this session only
+            cur.execute(f"CREATE TEMP TABLE {TABLE} (LIKE public.{TABLE} INCLUDING DEFAULTS)")
+            cur.execute(
+                f"INSERT INTO {TABLE} (entity, code, year, {METRIC}) VALUES "
+                "('Gap', 'GAP', 2000, 1), ('Gap', 'GAP', 2001, 2), ('Gap', 'GAP', 2003, 4), ('Gap', 'GAP', 2004, 6)"
+            )
+            query, params, _ = api.rolling_query(TABLE, MultiDict({"metric": METRIC, "window": "2"}))
+            cur.execute(query, params)
+            averages = {year: rolling for _, _, year, _, rolling in cur.fetchall()}
+    finally:
+        conn.close()
+    # 2002 is missing, so the 2003 window (2002-2003) holds 2003 alone
+    assert averages == {2000: 1, 2001: 1.5, 2003: 4, 2004: 5}
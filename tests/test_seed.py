@@ -0,0 +1,34 @@
+# tests/test_seed.py
+
+import psycopg2
+import pytest
+
+from seed import SERVING_DB_CONFIG, seed_postgres
+
+
+def test_refuses_the_serving_database():
+    with pytest.raises(ValueError, match="Refusing to seed"):
+        seed_postgres(1, db_config=SERVING_DB_CONFIG)
+
+
+def test_seeding_clears_source_metadata_and_bumps_the_version(seeded_db):
+    conn = psycopg2.connect(**seeded_db)
+    try:
+        with conn.cursor() as cur:
+            cur.execute("""
+                INSERT INTO ingestion_metadata (source, content_hash) VALUES ('per_capita_energy', 'real')
+                ON CONFLICT (source) DO UPDATE SET content_hash = EXCLUDED.content_hash
+            """)
+            cur.execute("SELECT version FROM data_version WHERE id = 1")
+            before = cur.fetchone()[0]
+        conn.commit()
+
+        seed_postgres(1, conn=conn)
+
+        with conn.cursor() as cur:
+            cur.execute("SELECT count(*) FROM ingestion_metadata")
+            assert cur.fetchone()[0] == 0
+            cur.execute("SELECT version FROM data_version WHERE id = 1")
+            assert cur.fetchone()[0] > before
+    finally:
+        conn.close()
@@ -0,0 +1,43 @@
+# tests/test_streaming.py
+
+import json
+
+import pytest
+
+import app as api
+
+PATH = "/api/global_energy_substitution"
+MODES = [(None, False), (False, False), (None, True)]  # (app.json.compact, app.debug)
+
+
+@pytest.fixture
+def json_mode(monkeypatch, request):
+    compact, debug = request.param
+    monkeypatch.setattr(api.app.json, "compact", compact)
+    monkeypatch.setattr(api.app, "debug", debug)
+    monkeypatch.setattr(api, "STREAM_BATCH_SIZE", 50)  # several batches per table
+    return request.param
+
+
+def expected(records):
+    """
+    What jsonify() makes of the records with the current settings.
+    """
+    with api.app.app_context():
+        return api.jsonify(records).get_data(as_text=True)
+
+
+@pytest.mark.parametrize("json_mode", MODES, indirect=True)
+def test_stream_matches_jsonify(db_client, json_mode):
+    resp = db_client.get(PATH)
+    assert resp.is_streamed
+    body = resp.get_data(as_text=True)
+    assert body == expected(json.loads(body))
+    assert ("\n  " in body) == (json_mode != (None, False))
+
+
+@pytest.mark.parametrize("json_mode", MODES, indirect=True)
+def test_empty_stream_matches_jsonify(db_client, json_mode):
+    conn = api.get_db_connection()
+    chunks = api.stream_records(conn, "SELECT year FROM global_energy_substitution WHERE false", (), ["year"])
+    assert "".join(chunks) == expected([])
@@ -0,0 +1,54 @@
+# tests/test_upsert.py
+
+import psycopg2
+
+from ingestion import write_rows
+from schema import value_columns
+from seed import synthetic_table
+
+TABLE = "share_electricity_renewables"
+
+
+def row_versions(conn):
+    """
+    (entity, year) -> xmin, which changes whenever a row is rewritten.
+    """
+    with conn.cursor() as cur:
+        cur.execute(f"SELECT entity, year, xmin::text FROM {TABLE}")
+        return {(entity, year): xmin for entity, year, xmin in cur.fetchall()}
+
+
+def data_version(conn):
+    with conn.cursor() as cur:
+        cur.execute("SELECT version FROM data_version WHERE id = 1")
+        version = cur.fetchone()[0]
+    conn.commit()
+    return version
+
+
+def test_upsert_of_unchanged_rows_writes_nothing(seeded_db):
+    conn = psycopg2.connect(**seeded_db)
+    try:
+        df = synthetic_table(TABLE)
+        before, version = row_versions(conn), data_version(conn)
+
+        # Same values, NULLs included: IS NOT DISTINCT, so no row is touched
+        write_rows(conn, TABLE, [df], mode="upsert")
+        assert row_versions(conn) == before
+        assert data_version(conn) == version
+
+        # One changed value and one missing row: only those change
+        changed = df.copy()
+        column = value_columns(TABLE)[0]
+        changed.loc[5, column] = 12345.0
+        dropped = tuple(changed.loc[6, ["entity", "year"]])
+        changed = changed.drop(index=6)
+        write_rows(conn, TABLE, [changed], mode="upsert")
+        after = row_versions(conn)
+        key = tuple(changed.loc[5, ["entity", "year"]])
+        assert set(before) - set(after) == {dropped}
+        assert [k for k in after if after[k] != before[k]] == [key]
+        assert data_version(conn) > version
+    finally:
+        write_rows(conn, TABLE, [synthetic_table(TABLE)])  # back to the seeded data
+        conn.close()
@@ -1,7 +1,21 @@
+import argparse
+import base64
+import gzip
+import hashlib
+import json
 import os
-import requests
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timezone
+import numpy as np
 import pandas as pd
+import plotly
 import plotly.express as px
+from plotly.io.json import to_json_plotly
+from plotly.offline import get_plotlyjs, get_plotlyjs_version
+
+from data_sources import make_source, save_snapshot
+from schema import value_columns
 
 # -------------------------------------------------------------------------
 # 1. Define Metadata for Our Visualizations
@@ -10,6 +24,7 @@ visualizations_info = {
     "global_energy_substitution": {
         "title": "Global Energy Substitution",
         "filename": "global_energy_substitution.html",
+        "params": {},
         "description": (
             "Explore the evolution of primary energy consumption "
             "by source from 1800–2023."
@@ -18,6 +33,7 @@ visualizations_info = {
     "per_capita_energy": {
         "title": "Per Capita Energy",
         "filename": "per_capita_energy.html",
+        "params": {"filter_year": 2023},
         "description": (
             "Compare per capita energy consumption by country, "
             "focusing on top consumers."
@@ -26,6 +42,7 @@ visualizations_info = {
     "share_of_renewables": {
         "title": "Share of Renewables",
         "filename": "share_of_renewables.html",
+        "params": {"filter_year": 2023},
         "description": (
             "See how renewable energy adoption varies across the globe "
             "with an interactive map."
@@ -147,6 +164,28 @@ FOOTER = """
 </html>
 """
 
+# The figure of a page: plotly.js comes from one shared, versioned asset
+# (cached by the browser across pages and builds) and the figure itself
+# from a separate JSON file, with numeric arrays base64-encoded by Plotly.
+PLOTLY_JS_ASSET = f"assets/plotly-{get_plotlyjs_version()}.min.js"
+
+CHART_SCRIPT = """
+<div id="{div_id}" class="plotly-graph-div" style="height:100%; width:100%;"></div>
+<script src="{plotly_js}"></script>
+<script>
+    fetch("{figure_json}")
+        .then(function (response) {{ return response.json(); }})
+        .then(function (figure) {{
+            Plotly.newPlot("{div_id}", figure.data, figure.layout, {{responsive: true}});
+        }});
+</script>
+"""
+
+# Year picker of the per-year pages
+YEAR_NAVIGATION = """
+<p class="year-nav">Year: <select onchange="location.href = this.value">{options}</select></p>
+"""
+
 # -------------------------------------------------------------------------
 # 3. Utility: Generate "Suggested Visualizations" & "Home" HTML
 # -------------------------------------------------------------------------
@@ -189,57 +228,40 @@ def generate_suggested_visualizations_html(current_key):
 # -------------------------------------------------------------------------
 # 4. Visualization Functions
 # -------------------------------------------------------------------------
-def global_energy_substitution_plot(api_url, output_html):
-    resp = requests.get(api_url)
-    data = resp.json()
-    df = pd.DataFrame(data)
-
-    # Convert numeric columns
-    numeric_cols = [
-        'other_renewables', 'biofuels', 'solar', 'wind',
-        'hydropower', 'nuclear', 'gas', 'oil', 'coal', 'traditional_biomass'
-    ]
-    for col in numeric_cols:
-        df[col] = pd.to_numeric(df[col], errors='coerce')
+# Each chart has a data function, which reads its DataFrame from `source`
+# (a data source from data_sources.py: the HTTP API, PostgreSQL or a
+# snapshot file), and a figure function, which builds the Plotly figure
+# from that frame. Both take the chart's params from visualizations_info.
+def global_energy_substitution_data(source):
+    return source.fetch('global_energy_substitution')
+
 
-    fig = px.area(
+def global_energy_substitution_figure(df):
+    numeric_cols = value_columns('global_energy_substitution')
+
+    return px.area(
         df.sort_values(by="year"),
         x="year",
         y=numeric_cols,
         title="Global Primary Energy Consumption by Source (1800–2023)",
         labels={'value': 'TWh (Substituted Energy)', 'year': 'Year'},
     )
-    fig_html = fig.to_html(full_html=False)
-    
-    suggested_html = generate_suggested_visualizations_html("global_energy_substitution")
 
-    with open(output_html, "w", encoding="utf-8") as f:
-        f.write(HEADER)
-        f.write(fig_html)
-        f.write(suggested_html)
-        f.write(FOOTER)
-
-    print(f"Global energy substitution chart saved to {output_html}")
 
+PER_CAPITA_TITLE = "Per Capita Primary Energy Consumption by Source ({year})"
+RENEWABLES_TITLE = "Share of Electricity Production from Renewables ({year})"
 
-def per_capita_energy_plot(api_url, output_html, filter_year=2023):
-    params = {'year': filter_year}
-    resp = requests.get(api_url, params=params)
-    data = resp.json()
-    df = pd.DataFrame(data)
 
-    df = df[df['entity'].notna()]
+def per_capita_energy_data(source, filter_year=2023, top_n=15):
+    # Entities ranked by total per-capita consumption; only the top N are returned
+    params = {'year': filter_year, 'n': top_n}
+    return source.fetch('per_capita_energy', params, aggregation='top').head(top_n)
 
-    numeric_cols = [
-        'coal_per_capita', 'oil_per_capita', 'gas_per_capita',
-        'nuclear_per_capita', 'hydro_per_capita', 'wind_per_capita',
-        'solar_per_capita', 'other_renewables_per_capita'
-    ]
-    for col in numeric_cols:
-        df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
 
-    df['total_per_capita'] = df[numeric_cols].sum(axis=1)
-    df = df.sort_values(by='total_per_capita', ascending=False).head(15)
+def per_capita_energy_figure(df, filter_year=2023, top_n=15):
+    numeric_cols = value_columns('per_capita_energy')
+    df = df.copy()
+    df[numeric_cols] = df[numeric_cols].fillna(0)
 
     df_melted = df.melt(
         id_vars=['entity'],
@@ -253,79 +275,418 @@ def per_capita_energy_plot(api_url, output_html, filter_year=2023):
         x="entity",
         y="kWh_per_capita",
         color="energy_source",
-        title=f"Per Capita Primary Energy Consumption by Source ({filter_year})",
+        title=PER_CAPITA_TITLE.format(year=filter_year),
         labels={'kWh_per_capita': 'kWh per Capita', 'entity': 'Country/Region'}
     )
     fig.update_layout(barmode='stack')
-
-    fig_html = fig.to_html(full_html=False)
-    suggested_html = generate_suggested_visualizations_html("per_capita_energy")
-
-    with open(output_html, "w", encoding="utf-8") as f:
-        f.write(HEADER)
-        f.write(fig_html)
-        f.write(suggested_html)
-        f.write(FOOTER)
-
-    print(f"Per capita energy consumption chart saved to {output_html}")
+    return fig
 
 
-def share_of_renewables_plot(api_url, output_html, filter_year=2023):
+def share_of_renewables_data(source, filter_year=2023):
     params = {'year': filter_year}
-    resp = requests.get(api_url, params=params)
-    data = resp.json()
-    df = pd.DataFrame(data)
+    return source.fetch('share_renewables', params)
 
-    df['renewables_pct_electricity'] = pd.to_numeric(
-        df['renewables_pct_electricity'], errors='coerce'
-    ).fillna(0)
+
+def share_of_renewables_figure(df, filter_year=2023):
+    df = df.copy()
+    df['renewables_pct_electricity'] = df['renewables_pct_electricity'].fillna(0)
     df['code'] = df['code'].fillna('')
 
-    fig = px.choropleth(
+    return px.choropleth(
         df,
         locations="code",
         color="renewables_pct_electricity",
         hover_name="entity",
         color_continuous_scale="Greens",
         range_color=(0, 100),
-        title=f"Share of Electricity Production from Renewables ({filter_year})",
+        title=RENEWABLES_TITLE.format(year=filter_year),
         labels={'renewables_pct_electricity': '% Renewables'}
     )
-    
-    fig_html = fig.to_html(full_html=False)
-    suggested_html = generate_suggested_visualizations_html("share_of_renewables")
+
+
+# Chart key -> (data function, figure function)
+CHARTS = {
+    "global_energy_substitution": (global_energy_substitution_data, global_energy_substitution_figure),
+    "per_capita_energy": (per_capita_energy_data, per_capita_energy_figure),
+    "share_of_renewables": (share_of_renewables_data, share_of_renewables_figure),
+}
+
+
+# -------------------------------------------------------------------------
+# Per-year pages. The data of every year is fetched once and split by year
+# in memory. The figure is built once, for the latest year, and serves as
+# the template of every other year: only the data arrays of its traces and
+# its title are swapped, so a year costs a JSON encode instead of a full
+# Plotly Express build.
+# -------------------------------------------------------------------------
+def typed_array(values):
+    """
+    The plotly.js typed array (base64 binary) of float `values`, as
+    Figure.to_json() writes numeric arrays.
+    """
+    values = np.ascontiguousarray(values, dtype="float64")
+    return {"dtype": "f8", "bdata": base64.b64encode(values.tobytes()).decode("ascii")}
+
+
+def per_capita_energy_years_data(source, top_n=15):
+    # Without a year filter, the top N entities of every year
+    return source.fetch('per_capita_energy', {'n': top_n}, aggregation='top')
+
+
+def per_capita_energy_year_traces(df, top_n=15):
+    # One bar trace per energy source, as px.bar builds them
+    df = df.head(top_n)
+    entities = df['entity'].tolist()
+    return [
+        {"x": entities, "y": typed_array(df[column].fillna(0))}
+        for column in value_columns('per_capita_energy')
+    ]
+
+
+def share_of_renewables_years_data(source):
+    return source.fetch('share_renewables')
+
+
+def share_of_renewables_year_traces(df):
+    return [{
+        "locations": df['code'].fillna('').tolist(),
+        "z": typed_array(df['renewables_pct_electricity'].fillna(0)),
+        "hovertext": df['entity'].tolist(),
+    }]
+
+
+# Chart key -> (all-years data function, per-year trace data function, title)
+YEARLY_CHARTS = {
+    "per_capita_energy": (per_capita_energy_years_data, per_capita_energy_year_traces, PER_CAPITA_TITLE),
+    "share_of_renewables": (share_of_renewables_years_data, share_of_renewables_year_traces, RENEWABLES_TITLE),
+}
+
+
+def year_page_filename(key, year):
+    return f"{os.path.splitext(visualizations_info[key]['filename'])[0]}_{year}.html"
+
+
+def year_figures(key, df, **params):
+    """
+    Yields (year, figure JSON) for every year in `df`, the chart's data
+    for all years.
+    """
+    _, figure = CHARTS[key]
+    _, year_traces, title = YEARLY_CHARTS[key]
+    partitions = dict(tuple(df.groupby('year', sort=True)))
+    years = list(partitions)
+    if not years:
+        return
+
+    latest = years[-1]
+    template = json.loads(figure(partitions[latest].reset_index(drop=True), filter_year=latest, **params).to_json())
+    for year in years:
+        traces = year_traces(partitions[year], **params)
+        data = [dict(trace, **patch) for trace, patch in zip(template["data"], traces)]
+        layout = dict(template["layout"], title=dict(template["layout"]["title"], text=title.format(year=year)))
+        yield year, to_json_plotly({"data": data, "layout": layout})
+
+
+def write_year_pages(key, df, output_dir, **params):
+    """
+    Writes a page per year of `df` (see year_figures), each with a year
+    picker. Returns the files written.
+    """
+    years = sorted(df['year'].unique())
+    written = []
+    for year, figure_json in year_figures(key, df, **params):
+        output_html = os.path.join(output_dir, year_page_filename(key, year))
+        options = "".join(
+            f'<option value="{year_page_filename(key, y)}"{" selected" if y == year else ""}>{y}</option>'
+            for y in reversed(years)
+        )
+        write_page(key, figure_json, output_html, YEAR_NAVIGATION.format(options=options))
+        written += [output_html, figure_json_path(output_html)]
+    print(f"{visualizations_info[key]['title']}: {len(years)} year pages saved to {output_dir}")
+    return written
+
+
+def figure_json_path(output_html):
+    return os.path.splitext(output_html)[0] + ".json"
+
+
+def write_plotly_asset(output_dir):
+    """
+    Writes the shared plotly.js bundle into `output_dir`, unless this
+    version is already there. Returns its path.
+    """
+    path = os.path.join(output_dir, PLOTLY_JS_ASSET)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.write(get_plotlyjs())
+        os.replace(temp_path, path)  # atomic, so parallel jobs never see a partial file
+    return path
+
+
+def write_page(key, figure_json, output_html, extra_html=""):
+    """
+    Writes a chart page: the shared header, the figure, `extra_html`, the
+    cards for the other charts and the footer. The figure JSON goes to a
+    file next to the page, loaded with the shared plotly.js asset.
+    """
+    write_plotly_asset(os.path.dirname(output_html))
+
+    json_path = figure_json_path(output_html)
+    with open(json_path, "w", encoding="utf-8") as f:
+        f.write(figure_json)
+
+    # The content hash in the URL makes browsers fetch the JSON again only when it changed
+    version = hashlib.sha256(figure_json.encode("utf-8")).hexdigest()[:12]
+    fig_html = CHART_SCRIPT.format(
+        div_id=key,
+        plotly_js=PLOTLY_JS_ASSET,
+        figure_json=f"{os.path.basename(json_path)}?v={version}",
+    )
+    suggested_html = generate_suggested_visualizations_html(key)
 
     with open(output_html, "w", encoding="utf-8") as f:
         f.write(HEADER)
         f.write(fig_html)
+        f.write(extra_html)
         f.write(suggested_html)
         f.write(FOOTER)
 
-    print(f"Share of renewables map saved to {output_html}")
+
+def write_chart_page(key, fig, output_html):
+    write_page(key, fig.to_json(), output_html)
+    print(f"{visualizations_info[key]['title']} chart saved to {output_html}")
+
+
+def build_chart(key, source, output_html, **params):
+    data, figure = CHARTS[key]
+    write_chart_page(key, figure(data(source, **params), **params), output_html)
+
+
+def global_energy_substitution_plot(source, output_html):
+    build_chart("global_energy_substitution", source, output_html)
+
+
+def per_capita_energy_plot(source, output_html, filter_year=2023, top_n=15):
+    build_chart("per_capita_energy", source, output_html, filter_year=filter_year, top_n=top_n)
+
+
+def share_of_renewables_plot(source, output_html, filter_year=2023):
+    build_chart("share_of_renewables", source, output_html, filter_year=filter_year)
 
 
 # -------------------------------------------------------------------------
-# 5. Main Script
+# 5. Build Driver
 # -------------------------------------------------------------------------
-if __name__ == "__main__":
-    # Adjust these if your local API is on a different host/port
-    GLOBAL_ENERGY_API = "http://127.0.0.1:5000/api/global_energy_substitution"
-    PER_CAPITA_API     = "http://127.0.0.1:5000/api/per_capita_energy"
-    RENEWABLES_API     = "http://127.0.0.1:5000/api/share_renewables"
+# Each chart is an independent job: read its data from the source, build
+# the figure, serialize it to JSON and write the small page and the JSON
+# file next to it (plotly.js is a shared asset, written once). Reading the
+# data is the slow part, and with the API source it waits on HTTP, so a
+# thread pool overlaps it and is the default. The figure and JSON step
+# takes only tens of milliseconds per chart, less than starting a worker
+# process, so the process pool only pays off for much larger figures.
+#
+# A page is only rebuilt when its build key changes: a hash of the chart's
+# data, its params and the page template (HEADER, FOOTER and the cards
+# made from visualizations_info). The keys of the last build are kept in a
+# manifest in the output directory; --force rebuilds every page anyway.
+EXECUTORS = {"process": ProcessPoolExecutor, "thread": ThreadPoolExecutor}
+MANIFEST_FILE = ".build-manifest.json"
+
+
+def build_key(name, df, params):
+    """
+    Hashes everything the pages of a chart job are made from.
+    """
+    digest = hashlib.sha256()
+    meta = {
+        "chart": name,
+        "params": params,
+        "columns": [[c, str(t)] for c, t in df.dtypes.items()],
+        "plotly": plotly.__version__,
+    }
+    digest.update(json.dumps(meta, sort_keys=True).encode("utf-8"))
+    chart = name.split(":")[0]
+    for part in (HEADER, FOOTER, CHART_SCRIPT, YEAR_NAVIGATION, PLOTLY_JS_ASSET,
+                 generate_suggested_visualizations_html(chart)):
+        digest.update(part.encode("utf-8"))
+    digest.update(pd.util.hash_pandas_object(df, index=True).values.tobytes())
+    return digest.hexdigest()
+
+
+def load_manifest(output_dir):
+    try:
+        with open(os.path.join(output_dir, MANIFEST_FILE), encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def save_manifest(output_dir, manifest):
+    with open(os.path.join(output_dir, MANIFEST_FILE), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+
+def chart_jobs(source, output_dir="visualizations", keys=None, manifest=None, years=False):
+    """
+    Builds the job registry from visualizations_info: one
+    (name, key, source, output, params, previous manifest entry) tuple per
+    chart page and, with `years`, one "<key>:years" job per chart in
+    YEARLY_CHARTS that writes its per-year pages into `output_dir`.
+    """
+    jobs = []
+    for key, info in visualizations_info.items():
+        if keys and key not in keys:
+            continue
+        output_html = os.path.join(output_dir, info['filename'])
+        jobs.append((key, key, source, output_html, dict(info['params']), (manifest or {}).get(key)))
+        if years and key in YEARLY_CHARTS:
+            name = f"{key}:years"
+            params = {k: v for k, v in info['params'].items() if k != 'filter_year'}
+            jobs.append((name, key, source, output_dir, params, (manifest or {}).get(name)))
+    return jobs
+
+
+def run_chart_job(job):
+    """
+    Runs one chart job: reads its data and, unless the build key matches
+    the previous build and its files are still there, renders its pages.
+    Returns (name, build key, files, whether it was rebuilt, seconds).
+    """
+    name, key, source, output, params, previous = job
+    previous = previous or {}
+    start = time.perf_counter()
+    yearly = name != key
+    data = YEARLY_CHARTS[key][0] if yearly else CHARTS[key][0]
+    df = data(source, **params)
+    digest = build_key(name, df, params)
+    outputs = previous.get("outputs", [])
+    rebuilt = digest != previous.get("build_key") or not outputs or not all(os.path.exists(path) for path in outputs)
+    if rebuilt and yearly:
+        outputs = write_year_pages(key, df, output, **params)
+    elif rebuilt:
+        write_chart_page(key, CHARTS[key][1](df, **params), output)
+        outputs = [output, figure_json_path(output)]
+    return name, digest, outputs, rebuilt, time.perf_counter() - start
+
+
+def build_charts(jobs, executor="thread", workers=None):
+    """
+    Runs the chart jobs, in a thread pool, a process pool or one after
+    another ("serial"). Returns name -> (build key, files, rebuilt, seconds).
+    """
+    start = time.perf_counter()
+    if executor == "serial" or len(jobs) < 2:
+        results = [run_chart_job(job) for job in jobs]
+    else:
+        with EXECUTORS[executor](max_workers=workers or len(jobs)) as pool:
+            results = list(pool.map(run_chart_job, jobs))
+    total = time.perf_counter() - start
+
+    results = {name: result for name, *result in results}
+    for name, (_, _, rebuilt, seconds) in results.items():
+        print(f"  {name:<28} {seconds:6.2f}s  {'built' if rebuilt else 'up to date'}")
+    rebuilt = sum(1 for _, _, r, _ in results.values() if r)
+    slowest = max((s for _, _, _, s in results.values()), default=0.0)
+    print(f"Built {rebuilt} of {len(results)} charts in {total:.2f}s ({executor}; slowest chart {slowest:.2f}s).")
+    return results
+
+
+def page_weights(output_dir="visualizations", keys=None):
+    """
+    Returns the bytes each chart page transfers: the HTML and figure JSON
+    on every visit, plus the shared plotly.js on the first one, raw and
+    gzip-compressed (as most web servers send them).
+    """
+    def sizes(path):
+        with open(path, "rb") as f:
+            body = f.read()
+        return len(body), len(gzip.compress(body))
+
+    asset = sizes(os.path.join(output_dir, PLOTLY_JS_ASSET))
+    weights = {}
+    for key, info in visualizations_info.items():
+        if keys and key not in keys:
+            continue
+        html_path = os.path.join(output_dir, info['filename'])
+        if not os.path.exists(html_path):
+            continue
+        html, figure = sizes(html_path), sizes(figure_json_path(html_path))
+        weights[key] = {
+            "html": html[0], "json": figure[0], "plotly_js": asset[0],
+            "first_visit": html[0] + figure[0] + asset[0],
+            "repeat_visit": html[0] + figure[0],
+            "first_visit_gzip": html[1] + figure[1] + asset[1],
+            "repeat_visit_gzip": html[1] + figure[1],
+        }
+    return weights
+
+
+def print_page_weights(weights):
+    print(f"{'page':<28} {'html':>9} {'json':>9} {'first visit':>12} {'repeat':>9} {'first gz':>9} {'repeat gz':>9}")
+    for key, w in weights.items():
+        print(f"{key:<28} {w['html']:>9,} {w['json']:>9,} {w['first_visit']:>12,} {w['repeat_visit']:>9,} "
+              f"{w['first_visit_gzip']:>9,} {w['repeat_visit_gzip']:>9,}")
+
+
+def build_site(source, output_dir="visualizations", keys=None, executor="thread", workers=None,
+               force=False, years=False):
+    """
+    Rebuilds the chart pages (and, with `years`, the per-year pages) whose
+    build key changed, or all of them with `force`, and updates the manifest.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    write_plotly_asset(output_dir)
+    manifest = load_manifest(output_dir)
+    jobs = chart_jobs(source, output_dir, keys, None if force else manifest, years)
+    results = build_charts(jobs, executor, workers)
+
+    built_at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    for name, _, _, _, params, _ in jobs:
+        digest, outputs, rebuilt, seconds = results[name]
+        entry = manifest.get(name, {}) if not rebuilt else {"built_at": built_at, "seconds": round(seconds, 3)}
+        manifest[name] = dict(entry, build_key=digest, outputs=outputs, params=params)
+    save_manifest(output_dir, manifest)
+    return results
 
-    # Create output directory if needed
-    os.makedirs("visualizations", exist_ok=True)
 
-    global_energy_html    = os.path.join(
-        "visualizations", visualizations_info["global_energy_substitution"]["filename"]
+# -------------------------------------------------------------------------
+# 6. Main Script
+# -------------------------------------------------------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the chart pages.")
+    parser.add_argument(
+        "--source", choices=["api", "postgres", "snapshot"], default="api",
+        help="api: fetch from app.py over HTTP (default); postgres: run the same queries "
+             "directly against app.DB_CONFIG; snapshot: read the --snapshot file"
     )
-    per_capita_html       = os.path.join(
-        "visualizations", visualizations_info["per_capita_energy"]["filename"]
+    # Adjust this if your local API is on a different host/port
+    parser.add_argument("--api-url", default="http://127.0.0.1:5000", help="base URL of app.py")
+    parser.add_argument("--snapshot", help="snapshot file for --source snapshot")
+    parser.add_argument("--save-snapshot", metavar="PATH",
+                        help="write every table from the source to a snapshot file first")
+    parser.add_argument("--output-dir", default="visualizations")
+    parser.add_argument(
+        "--executor", choices=["thread", "process", "serial"], default="thread",
+        help="thread: overlap the data reads (default); process: build charts in "
+             "parallel processes; serial: one after another"
     )
-    share_renewables_html = os.path.join(
-        "visualizations", visualizations_info["share_of_renewables"]["filename"]
+    parser.add_argument("--workers", type=int, help="pool size (default: one per chart)")
+    parser.add_argument("--charts", help=f"comma-separated subset of: {', '.join(visualizations_info)}")
+    parser.add_argument("--force", action="store_true", help="rebuild every page, even if unchanged")
+    parser.add_argument("--weights", action="store_true", help="print the bytes each page transfers")
+    parser.add_argument("--years", action="store_true",
+                        help=f"also build a page per year for: {', '.join(YEARLY_CHARTS)}")
+    args = parser.parse_args()
+
+    source = make_source(args.source, args.api_url, args.snapshot)
+    if args.save_snapshot:
+        save_snapshot(source, args.save_snapshot)
+
+    build_site(
+        source, args.output_dir, args.charts.split(",") if args.charts else None,
+        args.executor, args.workers, args.force, args.years
     )
-
-    global_energy_substitution_plot(GLOBAL_ENERGY_API, global_energy_html)
-    per_capita_energy_plot(PER_CAPITA_API, per_capita_html, filter_year=2023)
-    share_of_renewables_plot(RENEWABLES_API, share_renewables_html, filter_year=2023)
+    if args.weights:
+        print_page_weights(page_weights(args.output_dir))